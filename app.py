@@ -1,13 +1,27 @@
 from flask import Flask, render_template, session, request, redirect, url_for, flash
+from flask import Response, stream_with_context, jsonify
 from modules.auth import auth_bp
 import os
 from dotenv import load_dotenv
-from google import genai  # latest Gemini SDK
 from datetime import datetime
 from markupsafe import Markup, escape
 import sqlite3
-from flask import g
-from ml.infer import predict_sentiment, predict_topics
+import json
+import base64
+import re
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from modules.cache import ResponseCache, make_key
+from modules.render import markdown_to_html
+from modules.runs import record as record_run, list_page as list_runs, get as get_run
+from modules.runs import PAGE_SIZE as RUNS_PAGE_SIZE, MAX_PAGE_SIZE as RUNS_MAX_PAGE_SIZE
+from modules.db import DATABASE, get_db, init_app as init_db_app
+from modules.metrics import timed, init_app as init_metrics
+from init_db import init_db, migrate_db
+from labeler import assign_label
+from modules.llm import ResilientGemini, BASE_URL as GEMINI_BASE_URL
 
 
 
@@ -20,8 +34,27 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("⚠️ GEMINI_API_KEY not found in .env file")
 
-# Initialize Gemini client
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Gemini client (created on first use; importing the SDK alone costs ~1s)
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global client
+    if client is None:
+        # One client only: a discarded duplicate closes its HTTP pool on GC mid-request
+        with _client_lock:
+            if client is None:
+                from google import genai  # latest Gemini SDK
+                http_options = {"base_url": GEMINI_BASE_URL} if GEMINI_BASE_URL else None
+                client = genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+    return client
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# Deadlines, retries, concurrency cap, circuit breaker and hedging (modules/llm.py)
+gemini = ResilientGemini(get_client, GEMINI_MODEL)
+
+# Persistent cache for Copilot tool responses
+copilot_cache = ResponseCache()
 
 
 
@@ -34,6 +67,16 @@ app.secret_key = "your_secret_key_here"
 # Register Authentication Blueprint
 app.register_blueprint(auth_bp)
 
+# Request/span timings on /metrics, opt-in profiling via X-Profile (modules/metrics.py)
+init_metrics(app)
+
+# The ml/infer.py models load lazily; optionally start loading them in the background now.
+# Under gunicorn with preload (gunicorn.conf.py) the master loads them instead. /ready
+# reports what these loads found, so with WARMUP_MODELS=0 it stays "loading".
+from modules import preload
+if os.getenv("WARMUP_MODELS", "1") == "1" and not preload.ENABLED:
+    preload.warm_up(background=True)
+
 # ------------------------
 # Copilot Tool Definitions
 # ------------------------
@@ -123,52 +166,98 @@ COPILOT_TOOLS = {
 def require_login():
     return "user_id" in session
 
-def to_html_from_markdown(md_text: str) -> str:
+@timed("markdown_to_html")
+def to_html_from_markdown(md_text: str, cache: bool = True) -> str:
     """
-    Try to convert Markdown to HTML. If markdown package is unavailable,
-    fall back to a safe <pre> block.
+    Convert Markdown to HTML (see modules/render.py). Falls back to a
+    safe <pre> block if rendering fails.
     """
-    if not md_text:
-        return ""
-    try:
-        import markdown
-        html = markdown.markdown(
-            md_text,
-            extensions=["extra", "tables", "sane_lists", "toc"]
-        )
-        return html
-    except Exception:
-        # Safe fallback
-        return f'<pre style="white-space:pre-wrap">{escape(md_text)}</pre>'
+    return markdown_to_html(md_text, cache=cache)
+
+def token_usage(resp) -> dict:
+    """Prompt/output token counts from a Gemini response, when reported."""
+    meta = getattr(resp, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(meta, "prompt_token_count", None),
+        "output_tokens": getattr(meta, "candidates_token_count", None),
+    }
 
-def call_gemini_markdown(system_prompt: str, user_input: str) -> str:
+@timed()
+def call_gemini_markdown(system_prompt: str, user_input: str, usage: dict = None) -> str:
     """
-    Calls Gemini 1.5 Flash and returns markdown text.
+    Calls Gemini 1.5 Flash and returns markdown text. Token counts are
+    written into `usage` when given.
     """
     contents = system_prompt.format(user_input=user_input)
-    resp = client.models.generate_content(
-        model="gemini-1.5-flash",
-        contents=contents
-    )
+    resp = gemini.generate(contents)
+    if usage is not None:
+        usage.update(token_usage(resp), cached=False)
     return (resp.text or "").strip()
 
-# ✅ Database setup
-DATABASE = "database.db"
+def cached_gemini_markdown(tool_key: str, system_prompt: str, user_input: str, usage: dict = None) -> str:
+    """
+    Same as call_gemini_markdown, but served from the response cache when the
+    same tool/prompt/model has already answered this (normalized) input.
+    """
+    key = tool_cache_key(tool_key, system_prompt, user_input)
+    result = copilot_cache.get_or_compute(
+        key, lambda: call_gemini_markdown(system_prompt, user_input, usage)
+    )
+    if usage is not None:
+        usage.setdefault("cached", True)
+    return result
 
-def get_db():
-    if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
-        g.db.row_factory = sqlite3.Row
-    return g.db
+def tool_cache_key(tool_key: str, system_prompt: str, user_input: str) -> str:
+    return make_key(tool_key, system_prompt, GEMINI_MODEL, user_input)
 
-@app.teardown_appcontext
-def close_db(error):
-    if 'db' in g:
-        g.db.close()
+def save_run(user_id, tool_key, user_input, md_result, html, latency_ms, usage):
+    """Store a Copilot answer in its history; never fails the request."""
+    try:
+        return record_run(
+            get_db(), user_id, tool_key, user_input, md_result, html, GEMINI_MODEL,
+            latency_ms, usage, usage.get("cached", False)
+        )
+    except sqlite3.Error:
+        app.logger.exception("Could not record Copilot run")
+        return None
+
+def record_answer(user_id, tool_key, user_input, md_result, started, usage):
+    """Render a Copilot answer and store it in the history. Returns (html, run_id)."""
+    html = to_html_from_markdown(md_result)
+    return html, save_run(user_id, tool_key, user_input, md_result, html,
+                          (time.perf_counter() - started) * 1000, usage)
+
+def error_markdown(e: Exception) -> str:
+    return f"## Error\nSorry, something went wrong.\n\n**Details:** {e}"
+
+def error_answer(e: Exception):
+    """(markdown, html) shown in place of an answer that failed."""
+    md_result = error_markdown(e)
+    return md_result, to_html_from_markdown(md_result)
+
+def sse_event(payload: dict, event: str = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload)}\n\n"
+
+# ✅ Database setup (pooled, WAL-mode connections shared with the auth blueprint)
+init_db_app(app)
+init_db(DATABASE)
+migrate_db(DATABASE)
 
 # ------------------------
 # Routes
 # ------------------------
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once the scoring models (ml/infer.py) have been loaded, 503 before."""
+    status = preload.status()
+    ok = status in ("loaded", "keywords")
+    body = {"ready": ok, "models": {"scoring": status}}
+    if status == "error":
+        body["error"] = str(preload.load_error())
+    body["gemini"] = gemini.status()
+    return jsonify(body), (200 if ok else 503)
+
 @app.route('/')
 def index():
     return redirect(url_for('auth.login'))
@@ -188,8 +277,70 @@ def home():
 # ------------------------
 # Example Startup Generator
 # ------------------------
-@app.route('/generate', methods=['POST'])
-def generate():
+GENERATE_DEADLINE = float(os.getenv("GENERATE_DEADLINE", 20))  # seconds, shared by both calls
+llm_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_POOL_SIZE", 16)))
+
+def details_prompt(idea: str) -> str:
+    return (
+        "Generate a startup name, tagline, and short tech stack for this idea:\n"
+        f"{idea}\n\n"
+        "Return strictly in this format:\n"
+        "Name: <name>\n"
+        "Tagline: <tagline>\n"
+        "Tech Stack: <comma-separated list>"
+    )
+
+def label_prompt(idea: str) -> str:
+    return (
+        "Analyze the following startup idea and assign a **concise category label** "
+        "(like FinTech, EdTech, AI/ML, HealthTech, E-commerce, GreenTech, Social Media, etc).\n"
+        f"Idea: {idea}\n\n"
+        "Return only one short label (1–2 words), nothing else."
+    )
+
+def generate_startup_details(idea: str):
+    resp = gemini.generate(details_prompt(idea), timeout=GENERATE_DEADLINE)
+    return parse_startup_details(resp.text)
+
+def parse_startup_details(text: str):
+    text = (text or "")
+    name, tagline, stack = "N/A", "N/A", []
+
+    for line in text.splitlines():
+        low = line.lower().strip()
+        if low.startswith("name:"):
+            name = line.split(":", 1)[1].strip()
+        elif low.startswith("tagline:"):
+            tagline = line.split(":", 1)[1].strip()
+        elif low.startswith("tech stack:"):
+            stack = [t.strip() for t in line.split(":", 1)[1].split(",") if t.strip()]
+
+    if not stack:
+        stack = ["Python", "Flask", "SQLite"]
+    return name, tagline, stack
+
+def generate_label(idea: str) -> str:
+    """Auto-label the idea (semantic classification)."""
+    return parse_label(gemini.generate(label_prompt(idea), timeout=GENERATE_DEADLINE).text)
+
+def parse_label(text: str) -> str:
+    return (text or "General").strip()
+
+def offline_startup_details(idea: str):
+    name = f"{idea.split()[0].capitalize()}X" if idea.strip() else "StarterX"
+    tagline = f"Revolutionizing {idea or 'your idea'} with AI"
+    stack = ["Python", "Flask", "SQLite", "Tailwind CSS"]
+    return name, tagline, stack
+
+def _outcome(future, done):
+    """The future's result, or the exception that stands in for it."""
+    if future not in done:
+        future.cancel()
+        return TimeoutError(f"Gemini did not answer within {GENERATE_DEADLINE:g}s")
+    return future.exception() or future.result()
+
+def generate_form():
+    """The /generate form as (idea, user_label), or the redirect to send instead."""
     if not require_login():
         return redirect(url_for('auth.login'))
 
@@ -199,57 +350,29 @@ def generate():
     if not idea:
         flash("Please enter your startup idea.", "danger")
         return redirect(url_for('home'))
+    return idea, user_label
 
-    try:
-        # ✅ Step 1: Generate startup details
-        resp = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=(
-                "Generate a startup name, tagline, and short tech stack for this idea:\n"
-                f"{idea}\n\n"
-                "Return strictly in this format:\n"
-                "Name: <name>\n"
-                "Tagline: <tagline>\n"
-                "Tech Stack: <comma-separated list>"
-            )
-        )
-
-        text = (resp.text or "")
-        name, tagline, stack = "N/A", "N/A", []
-
-        for line in text.splitlines():
-            low = line.lower().strip()
-            if low.startswith("name:"):
-                name = line.split(":", 1)[1].strip()
-            elif low.startswith("tagline:"):
-                tagline = line.split(":", 1)[1].strip()
-            elif low.startswith("tech stack:"):
-                stack = [t.strip() for t in line.split(":", 1)[1].split(",") if t.strip()]
-
-        if not stack:
-            stack = ["Python", "Flask", "SQLite"]
-
-        # ✅ Step 2: Auto-label the idea (semantic classification)
-        if not user_label:  
-            label_resp = client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=(
-                    "Analyze the following startup idea and assign a **concise category label** "
-                    "(like FinTech, EdTech, AI/ML, HealthTech, E-commerce, GreenTech, Social Media, etc).\n"
-                    f"Idea: {idea}\n\n"
-                    "Return only one short label (1–2 words), nothing else."
-                )
-            )
-            auto_label = (label_resp.text or "General").strip()
-        else:
-            auto_label = user_label  # User overrides AI label
-
-    except Exception as e:
-        name = f"{idea.split()[0].capitalize()}X" if idea.strip() else "StarterX"
-        tagline = f"Revolutionizing {idea or 'your idea'} with AI"
-        stack = ["Python", "Flask", "SQLite", "Tailwind CSS"]
-        auto_label = user_label if user_label else "General"
-        flash(f"API Error: {e}", "danger")
+def startup_result(idea: str, user_label: str, details, label):
+    """
+    Render result.html from the outcomes of the two Gemini calls. Either
+    may be an exception, in which case the offline fallback is used.
+    """
+    errors = []
+    if isinstance(details, Exception):
+        errors.append(details)
+        details = offline_startup_details(idea)
+    name, tagline, stack = details
+
+    if user_label:
+        auto_label = user_label  # User overrides AI label
+    elif isinstance(label, Exception):
+        errors.append(label)
+        auto_label = assign_label(idea)  # keyword rules, no network needed
+    else:
+        auto_label = label
+
+    if errors:
+        flash(f"API Error: {errors[0]}", "danger")
 
     return render_template(
         'result.html',
@@ -260,6 +383,24 @@ def generate():
         tech_stack=stack
     )
 
+@app.route('/generate', methods=['POST'])
+def generate():
+    form = generate_form()
+    if not isinstance(form, tuple):
+        return form
+    idea, user_label = form
+
+    # ✅ Both calls are independent, so issue them together under one deadline
+    # copy_context() keeps this request's metric labels on the pool threads
+    futures = {"details": llm_pool.submit(contextvars.copy_context().run, generate_startup_details, idea)}
+    if not user_label:
+        futures["label"] = llm_pool.submit(contextvars.copy_context().run, generate_label, idea)
+    done, _ = wait(futures.values(), timeout=GENERATE_DEADLINE)
+
+    details = _outcome(futures["details"], done)
+    label = _outcome(futures["label"], done) if not user_label else None
+    return startup_result(idea, user_label, details, label)
+
 
 
 # ------------------------
@@ -271,8 +412,11 @@ def copilot_home():
         return redirect(url_for('auth.login'))
     return render_template('copilot.html', tools=COPILOT_TOOLS)
 
-@app.route('/tool/<key>', methods=['GET', 'POST'])
-def tool(key):
+def tool_form(key):
+    """
+    A POST to /tool/<key> as (tool_def, user_input), or the response to
+    send instead: a redirect, or the form itself for a GET.
+    """
     if not require_login():
         return redirect(url_for('auth.login'))
 
@@ -290,19 +434,29 @@ def tool(key):
             placeholder=tool_def["placeholder"]
         )
 
-    # POST
     user_input = request.form.get('user_input', '').strip()
     if not user_input:
         flash("Please provide some input.", "danger")
         return redirect(url_for('tool', key=key))
+    return tool_def, user_input
 
+@app.route('/tool/<key>', methods=['GET', 'POST'])
+def tool(key):
+    form = tool_form(key)
+    if not isinstance(form, tuple):
+        return form
+    tool_def, user_input = form
+
+    usage = {}
+    started = time.perf_counter()
     try:
-        md_result = call_gemini_markdown(tool_def["prompt"], user_input)
-        html_result = to_html_from_markdown(md_result)
+        md_result = cached_gemini_markdown(key, tool_def["prompt"], user_input, usage)
+        html_result, run_id = record_answer(session["user_id"], key, user_input, md_result, started, usage)
     except Exception as e:
-        md_result = f"## Error\nSorry, something went wrong.\n\n**Details:** {e}"
-        html_result = to_html_from_markdown(md_result)
+        (md_result, html_result), run_id = error_answer(e), None
+    return tool_result(tool_def, user_input, md_result, html_result, run_id)
 
+def tool_result(tool_def: dict, user_input: str, md_result: str, html_result: str, run_id):
     # Pass BOTH naming conventions so whichever template you have will work
     return render_template(
         'tool_result.html',
@@ -315,19 +469,169 @@ def tool(key):
         result=Markup(html_result),
         # raw in case you need it
         result_raw=md_result,
+        run_id=run_id,
         timestamp=datetime.utcnow()
     )
 
+class ToolStream:
+    """
+    The steps of one /tool/<key>/stream response, shared by tool_stream()
+    and its async twin in asgi.py, which differ only in how they iterate
+    the Gemini stream and where the blocking steps run. Each step returns
+    the SSE event to send, if any.
+    """
+
+    def __init__(self, key: str, tool_def: dict, user_input: str, user_id):
+        self.key = key
+        self.user_input = user_input
+        self.user_id = user_id
+        self.prompt = tool_def["prompt"].format(user_input=user_input)
+        self.cache_key = tool_cache_key(key, tool_def["prompt"], user_input)
+        self.started = time.perf_counter()
+        self.parts, self.usage = [], {}
+
+    def cached(self):
+        """The final event straight from the response cache, or None on a miss."""
+        md_result = copilot_cache.get(self.cache_key)
+        if md_result is None:
+            return None
+        html, run_id = record_answer(self.user_id, self.key, self.user_input, md_result,
+                                     self.started, {"cached": True})
+        return sse_event({"html": html, "markdown": md_result, "run_id": run_id}, "done")
+
+    def chunk(self, chunk):
+        # usage_metadata is cumulative; the last chunk carries the totals
+        if getattr(chunk, "usage_metadata", None):
+            self.usage.update(token_usage(chunk))
+        if not chunk.text:
+            return None
+        self.parts.append(chunk.text)
+        return sse_event({"html": to_html_from_markdown("".join(self.parts), cache=False)})
+
+    def done(self):
+        md_result = "".join(self.parts).strip()
+        copilot_cache.set(self.cache_key, md_result)
+        html, run_id = record_answer(self.user_id, self.key, self.user_input, md_result,
+                                     self.started, dict(self.usage, cached=False))
+        return sse_event({"html": html, "markdown": md_result, "run_id": run_id}, "done")
+
+    @staticmethod
+    def failed(e: Exception):
+        md_result, html = error_answer(e)
+        return sse_event({"html": html, "markdown": md_result, "run_id": None}, "done")
+
+def tool_stream_request(key):
+    """A ToolStream for this request, or the error response to send instead."""
+    if not require_login():
+        return Response(status=401)
+
+    tool_def = COPILOT_TOOLS.get(key)
+    user_input = request.form.get('user_input', '').strip()
+    if not tool_def or not user_input:
+        return Response(status=400)
+    return ToolStream(key, tool_def, user_input, session["user_id"])
+
+def event_stream_response(events, response_class=Response):
+    return response_class(events, mimetype="text/event-stream",
+                          headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/tool/<key>/stream', methods=['POST'])
+def tool_stream(key):
+    """
+    Server-sent events version of tool(): pushes the rendered HTML of the
+    markdown received so far after every chunk, then a final `done` event.
+    """
+    stream = tool_stream_request(key)
+    if not isinstance(stream, ToolStream):
+        return stream
+
+    def events():
+        cached = stream.cached()
+        if cached is not None:
+            yield cached
+            return
+        try:
+            for chunk in gemini.stream(stream.prompt):
+                event = stream.chunk(chunk)
+                if event is not None:
+                    yield event
+            final = stream.done()
+        except Exception as e:
+            final = stream.failed(e)
+        yield final
+
+    return event_stream_response(stream_with_context(events()))
+
+# ------------------------
+# Copilot History
+# ------------------------
+@app.route('/copilot/history')
+def copilot_history():
+    """Past tool runs, newest first; ?before=<run id> pages back, ?tool= filters."""
+    if not require_login():
+        return redirect(url_for('auth.login'))
+
+    tool_key = request.args.get("tool") or None
+    limit = max(1, min(request.args.get("limit", RUNS_PAGE_SIZE, type=int), RUNS_MAX_PAGE_SIZE))
+    rows, next_before = list_runs(
+        get_db(), session["user_id"], request.args.get("before", type=int), limit, tool_key
+    )
+    return render_template(
+        'copilot_history.html',
+        runs=rows,
+        tools=COPILOT_TOOLS,
+        tool_key=tool_key,
+        next_before=next_before,
+        as_datetime=datetime.fromtimestamp,
+    )
+
+@app.route('/copilot/history/<int:run_id>')
+def copilot_run(run_id):
+    """Re-show a stored answer from its pre-rendered HTML; no LLM call."""
+    if not require_login():
+        return redirect(url_for('auth.login'))
+
+    run = get_run(get_db(), session["user_id"], run_id)
+    if run is None:
+        flash("Run not found.", "danger")
+        return redirect(url_for('copilot_history'))
+
+    tool_def = COPILOT_TOOLS.get(run["tool_key"], {})
+    return render_template(
+        'tool_result.html',
+        title=tool_def.get("title", run["tool_key"]),
+        input_text=run["input"],
+        markdown_result=Markup(run["html"]),
+        query=run["input"],
+        result=Markup(run["html"]),
+        result_raw=run["markdown"],
+        run_id=run_id,
+        timestamp=datetime.fromtimestamp(run["created_at"])
+    )
+
 # ------------------------
 # Save Ideas
 # ------------------------
 
 # ---------------- SAVE IDEA ----------------
-from sentiment import analyze_sentiment
-from labeler import assign_label   # ✅ helper for labeling ideas
+from modules.enrichment import PENDING, USER_VERSION, EnrichmentWorkers, WORKERS as ENRICHMENT_WORKERS
+from modules.enrichment import enqueue as enqueue_enrichment, notify as notify_enrichment
 import sqlite3
 from flask import request, redirect, url_for, session, flash
 
+# Sentiment and label are filled in by background workers (modules/enrichment.py);
+# ENRICHMENT_WORKERS=0 leaves that to a separate `python -m modules.enrichment`.
+enrichment_workers = None
+
+def start_background_work():
+    """Background threads; run per worker after fork when the app is preloaded."""
+    global enrichment_workers
+    if ENRICHMENT_WORKERS > 0 and enrichment_workers is None:
+        enrichment_workers = EnrichmentWorkers(ENRICHMENT_WORKERS, db_path=DATABASE).start()
+
+if not preload.ENABLED:
+    start_background_work()
+
 @app.route("/save_idea", methods=["POST"])
 def save_idea():
     if "user_id" not in session:
@@ -344,21 +648,15 @@ def save_idea():
         return redirect(url_for("dashboard"))
 
     try:
-        # ✅ Sentiment (Positive / Negative / Neutral)
-        sentiment = analyze_sentiment(idea)
-
-        # ✅ AI-powered Label (category like AI, FinTech, HealthTech, etc.)
-        label = assign_label(idea)
-
-        # ✅ Save to DB
-        conn = sqlite3.connect("database.db")
-        c = conn.cursor()
-        c.execute("""
-            INSERT INTO saved_ideas (user_id, idea, startup_name, tagline, tech_stack, sentiment, label)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (session["user_id"], idea, startup_name, tagline, tech_stack, sentiment, label))
-        conn.commit()
-        conn.close()
+        # ✅ Save to DB now; sentiment & label are computed in the background
+        db = get_db()
+        cur = db.execute("""
+            INSERT INTO saved_ideas (user_id, idea, startup_name, tagline, tech_stack, sentiment, label, enrichment_status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (session["user_id"], idea, startup_name, tagline, tech_stack, PENDING, PENDING, PENDING))
+        enqueue_enrichment(db, cur.lastrowid)
+        db.commit()
+        notify_enrichment()
 
         flash("Idea saved successfully!", "success")
 
@@ -370,19 +668,148 @@ def save_idea():
 
 
 # ---------------- VIEW IDEAS ----------------
+SAVED_IDEAS_PAGE_SIZE = 20
+SAVED_IDEAS_MAX_PAGE_SIZE = 100
+# Only what the list view shows
+SAVED_IDEAS_LIST_COLUMNS = "id, startup_name, tagline, idea, tech_stack, sentiment, label, enrichment_status, created_at"
+
+def encode_cursor(row) -> str:
+    raw = json.dumps([row["created_at"], row["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, idea_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return created_at, int(idea_id)
+    except Exception:
+        return None
+
+def fetch_saved_ideas_page(user_id, cursor=None, limit=SAVED_IDEAS_PAGE_SIZE):
+    """
+    Keyset pagination, newest first, served by idx_saved_ideas_user_created.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    sql = f"SELECT {SAVED_IDEAS_LIST_COLUMNS} FROM saved_ideas WHERE user_id = ?"
+    params = [user_id]
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        sql += " AND (created_at, id) < (?, ?)"
+        params.extend(position)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = get_db().execute(sql, params).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def _page_size():
+    limit = request.args.get("limit", SAVED_IDEAS_PAGE_SIZE, type=int)
+    return max(1, min(limit, SAVED_IDEAS_MAX_PAGE_SIZE))
+
 @app.route("/saved_ideas")
 def saved_ideas():
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for("auth.login"))
 
-    db = get_db()
-    ideas = db.execute(
-        "SELECT * FROM saved_ideas WHERE user_id = ?", (session["user_id"],)
-    ).fetchall()
+    ideas, next_cursor = fetch_saved_ideas_page(
+        session["user_id"], request.args.get("cursor"), _page_size()
+    )
+    return render_template("saved_ideas.html", ideas=ideas, next_cursor=next_cursor)
+
+@app.route("/saved_ideas.json")
+def saved_ideas_json():
+    """Infinite-scroll feed for the saved ideas list."""
+    if "user_id" not in session:
+        return jsonify({"error": "login required"}), 401
+
+    ideas, next_cursor = fetch_saved_ideas_page(
+        session["user_id"], request.args.get("cursor"), _page_size()
+    )
+    return jsonify({"ideas": [dict(row) for row in ideas], "next_cursor": next_cursor})
+
+# ---------------- SEARCH IDEAS ----------------
+SEARCH_PAGE_SIZE = 10
+_HL_START, _HL_END = "\x02", "\x03"  # placeholders, swapped for <mark> after escaping
+
+def build_fts_query(q: str, prefix: bool = True) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word is quoted (so FTS
+    syntax in user input is inert) and the last word matches as a prefix.
+    """
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    if prefix:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+def highlight(snippet: str) -> str:
+    return str(escape(snippet)).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+@app.route("/saved_ideas/search")
+def search_saved_ideas():
+    if "user_id" not in session:
+        return jsonify({"error": "login required"}), 401
+
+    q = request.args.get("q", "").strip()
+    page = max(1, request.args.get("page", 1, type=int))
+    limit = max(1, min(request.args.get("limit", SEARCH_PAGE_SIZE, type=int), SAVED_IDEAS_MAX_PAGE_SIZE))
+    match = build_fts_query(q, prefix=request.args.get("prefix", "1") != "0")
+    if not match:
+        return jsonify({"q": q, "page": page, "results": [], "has_more": False})
+
+    # bm25 column weights follow the table: idea, startup_name, tagline, tech_stack
+    rows = get_db().execute(f"""
+        SELECT s.id, s.startup_name, s.tagline, s.created_at,
+               bm25(saved_ideas_fts, 1.0, 5.0, 3.0, 2.0) AS rank,
+               snippet(saved_ideas_fts, -1, ?, ?, '…', 16) AS snippet
+        FROM saved_ideas_fts
+        JOIN saved_ideas s ON s.id = saved_ideas_fts.rowid
+        WHERE saved_ideas_fts MATCH ? AND s.user_id = ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """, (_HL_START, _HL_END, match, session["user_id"], limit + 1, (page - 1) * limit)).fetchall()
+
+    results = [{
+        "id": r["id"],
+        "startup_name": r["startup_name"],
+        "tagline": r["tagline"],
+        "created_at": r["created_at"],
+        "rank": r["rank"],
+        "snippet": highlight(r["snippet"]),
+    } for r in rows[:limit]]
+    return jsonify({"q": q, "page": page, "results": results, "has_more": len(rows) > limit})
+
+# ---------------- SIMILAR IDEAS ----------------
+from modules.embeddings import similar as similar_ideas, forget as forget_embedding
+
+@app.route("/saved_ideas/similar", methods=["GET", "POST"])
+def saved_ideas_similar():
+    """
+    Most similar saved ideas to `text` (e.g. a freshly generated idea, to warn
+    about near-duplicates before saving) or to an existing `idea_id`.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "login required"}), 401
 
-    return render_template("saved_ideas.html", ideas=ideas)
+    values = request.values
+    k = max(1, min(values.get("k", 5, type=int), 50))
+    try:
+        results = similar_ideas(
+            get_db(), session["user_id"],
+            text=values.get("text", "").strip() or None,
+            idea_id=values.get("idea_id", type=int),
+            k=k,
+        )
+    except Exception as e:
+        # Embedding model unavailable: similarity is a nice-to-have
+        return jsonify({"results": [], "duplicate": False, "error": str(e)}), 503
+    return jsonify({"results": results, "duplicate": any(r["duplicate"] for r in results)})
 
 # ---------------- EDIT IDEA ----------------
+EDIT_SENTIMENTS = ("positive", "neutral", "negative")
+
 @app.route("/edit_idea/<int:idea_id>", methods=["GET", "POST"])
 def edit_idea(idea_id):
     if "user_id" not in session:
@@ -395,12 +822,36 @@ def edit_idea(idea_id):
         tagline = request.form["tagline"]
         idea = request.form["idea"]
         tech_stack = request.form["tech_stack"]
+        sentiment = request.form.get("sentiment", "").strip()
+        label = request.form.get("label", "").strip()
 
+        old = db.execute(
+            "SELECT idea, sentiment, label, enrichment_status FROM saved_ideas WHERE id=? AND user_id=?",
+            (idea_id, session["user_id"]),
+        ).fetchone()
         db.execute(
             "UPDATE saved_ideas SET startup_name=?, tagline=?, idea=?, tech_stack=? WHERE id=? AND user_id=?",
             (startup_name, tagline, idea, tech_stack, idea_id, session["user_id"]),
         )
+        relabelled = old is not None and sentiment in EDIT_SENTIMENTS and label and (
+            sentiment != old["sentiment"] or label != old["label"]
+        )
+        if relabelled:
+            # Set by hand: kept by enrichment and re-scoring, and used for training
+            db.execute(
+                "UPDATE saved_ideas SET sentiment=?, label=?, model_version=? WHERE id=?",
+                (sentiment, label, USER_VERSION, idea_id),
+            )
+        # New text means new sentiment, label and embedding
+        if old is not None and old["idea"] != idea:
+            if not relabelled:
+                db.execute("UPDATE saved_ideas SET model_version=NULL WHERE id=?", (idea_id,))
+            db.execute("UPDATE saved_ideas SET enrichment_status=? WHERE id=?", (PENDING, idea_id))
+            enqueue_enrichment(db, idea_id)
+        elif relabelled and old["enrichment_status"] == PENDING:
+            enqueue_enrichment(db, idea_id)  # the queued job's write-back is now stale
         db.commit()
+        notify_enrichment()
         return redirect(url_for("saved_ideas"))
 
     idea = db.execute(
@@ -408,7 +859,7 @@ def edit_idea(idea_id):
         (idea_id, session["user_id"]),
     ).fetchone()
 
-    return render_template("edit_idea.html", idea=idea)
+    return render_template("edit_idea.html", idea=idea, sentiments=EDIT_SENTIMENTS)
 
 # ---------------- DELETE IDEA ----------------
 @app.route("/delete_idea/<int:idea_id>", methods=["POST"])
@@ -419,6 +870,7 @@ def delete_idea(idea_id):
     db = get_db()
     db.execute("DELETE FROM saved_ideas WHERE id=? AND user_id=?", (idea_id, session["user_id"]))
     db.commit()
+    forget_embedding(session["user_id"], idea_id)
     return redirect(url_for("saved_ideas"))
 
 
@@ -0,0 +1,259 @@
+# asgi.py
+"""
+Async serving mode.
+
+The LLM-bound routes are served natively on the event loop, awaiting the
+Gemini SDK's asyncio client through modules/llm.py:
+  POST /generate
+  POST /tool/<key>
+  POST /tool/<key>/stream
+A request waiting on Gemini then holds a coroutine instead of a worker
+thread, so one process can keep hundreds of LLM calls in flight. The
+views run inside a regular Flask request context, so sessions, flash(),
+url_for() and templates behave exactly as in app.py. They share their
+validation, caching, history and SSE steps with app.py's views; only the
+awaiting differs.
+
+Every other route is the unchanged Flask app, run through asgiref's
+WsgiToAsgi on a thread pool, so blocking work (SQLite, ML inference in
+ml/infer.py) stays off the event loop. Run with any ASGI server, e.g.:
+
+    pip install uvicorn "flask[async]"
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import session, Response
+from werkzeug.exceptions import HTTPException
+
+from app import (
+    app, gemini, copilot_cache, GENERATE_DEADLINE, ToolStream,
+    generate_form, details_prompt, label_prompt, parse_startup_details, parse_label, startup_result,
+    tool_form, tool_cache_key, record_answer, error_answer, tool_result,
+    tool_stream_request, event_stream_response, token_usage,
+)
+
+# Threads for the WSGI routes and the async views' blocking steps (the loop's default executor)
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 32))
+
+
+# ------------------------
+# Async views
+# ------------------------
+async def generate_async():
+    form = generate_form()
+    if not isinstance(form, tuple):
+        return form
+    idea, user_label = form
+
+    calls = [gemini.agenerate(details_prompt(idea), timeout=GENERATE_DEADLINE)]
+    if not user_label:
+        calls.append(gemini.agenerate(label_prompt(idea), timeout=GENERATE_DEADLINE))
+    outcomes = await asyncio.gather(*calls, return_exceptions=True)
+
+    details = outcomes[0]
+    if not isinstance(details, Exception):
+        details = parse_startup_details(details.text)
+    label = None
+    if not user_label:
+        label = outcomes[1]
+        if not isinstance(label, Exception):
+            label = parse_label(label.text)
+    return startup_result(idea, user_label, details, label)
+
+async def cached_gemini_markdown_async(tool_key: str, system_prompt: str, user_input: str, usage: dict) -> str:
+    key = tool_cache_key(tool_key, system_prompt, user_input)
+    cached = await asyncio.to_thread(copilot_cache.get, key)
+    if cached is not None:
+        usage["cached"] = True
+        return cached
+    resp = await gemini.agenerate(system_prompt.format(user_input=user_input))
+    usage.update(token_usage(resp), cached=False)
+    result = (resp.text or "").strip()
+    await asyncio.to_thread(copilot_cache.set, key, result)
+    return result
+
+async def tool_async(key):
+    form = tool_form(key)
+    if not isinstance(form, tuple):
+        return form
+    tool_def, user_input = form
+
+    usage = {}
+    started = time.perf_counter()
+    try:
+        md_result = await cached_gemini_markdown_async(key, tool_def["prompt"], user_input, usage)
+        html_result, run_id = await asyncio.to_thread(
+            record_answer, session["user_id"], key, user_input, md_result, started, usage
+        )
+    except Exception as e:
+        (md_result, html_result), run_id = error_answer(e), None
+    return tool_result(tool_def, user_input, md_result, html_result, run_id)
+
+async def tool_stream_async(key):
+    stream = tool_stream_request(key)
+    if not isinstance(stream, ToolStream):
+        return stream
+
+    async def events():
+        cached = await asyncio.to_thread(stream.cached)
+        if cached is not None:
+            yield cached
+            return
+        try:
+            async for chunk in gemini.astream(stream.prompt):
+                event = await asyncio.to_thread(stream.chunk, chunk)
+                if event is not None:
+                    yield event
+            final = await asyncio.to_thread(stream.done)
+        except Exception as e:
+            final = stream.failed(e)
+        yield final
+
+    return event_stream_response(events(), AsyncStream)
+
+# (endpoint, method) -> coroutine view; everything else goes to the WSGI app
+ASYNC_VIEWS = {
+    ("generate", "POST"): generate_async,
+    ("tool", "POST"): tool_async,
+    ("tool_stream", "POST"): tool_stream_async,
+}
+
+
+# ------------------------
+# ASGI plumbing
+# ------------------------
+class AsyncStream:
+    """Streaming response whose body is an async iterator of str/bytes."""
+
+    def __init__(self, body, status: int = 200, mimetype: str = "text/plain", headers: dict = None):
+        self.body = body
+        self.response = Response(status=status, mimetype=mimetype, headers=headers)
+
+class _WsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every WSGI request on one shared thread by default
+    # (thread_sensitive); the Flask app is thread-safe, so use the pool
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False)
+
+class _WsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _WsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+wsgi_application = _WsgiToAsgi(app)
+
+def build_environ(scope: dict, body: bytes) -> dict:
+    """WSGI environ for an ASGI HTTP scope (PEP 3333 / ASGI spec mapping)."""
+    from io import BytesIO
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": unquote(scope["path"], errors="surrogateescape").encode("utf-8", "surrogateescape").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]) if server[1] else "80",
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+def _headers(pairs):
+    return [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in pairs]
+
+async def run_async_view(view, view_args: dict, environ: dict, send):
+    """
+    Dispatch a coroutine view inside a Flask request context. Flask keeps
+    its contexts in contextvars, so each ASGI task sees only its own.
+    """
+    ctx = app.request_context(environ)
+    ctx.push()
+    error = None
+    try:
+        try:
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await view(**view_args)
+        except HTTPException as e:
+            rv = e
+        except Exception as e:
+            error = e
+            rv = app.handle_exception(e)
+
+        if isinstance(rv, AsyncStream):
+            response = app.process_response(rv.response)
+            await send({"type": "http.response.start", "status": response.status_code,
+                        "headers": _headers(response.headers.items())})
+            async for chunk in rv.body:
+                data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                await send({"type": "http.response.body", "body": data, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        response = app.process_response(app.make_response(rv))
+        await send({"type": "http.response.start", "status": response.status_code,
+                    "headers": _headers(response.headers.items())})
+        await send({"type": "http.response.body", "body": response.get_data()})
+    finally:
+        ctx.pop(error)
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                asyncio.get_running_loop().set_default_executor(
+                    ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi"))
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    adapter = app.url_map.bind_to_environ(build_environ(scope, b""))
+    try:
+        endpoint, view_args = adapter.match()
+    except Exception:
+        endpoint, view_args = None, {}
+    view = ASYNC_VIEWS.get((endpoint, scope["method"]))
+    if view is None:
+        await wsgi_application(scope, receive, send)
+    else:
+        await run_async_view(view, view_args, build_environ(scope, await read_body(receive)), send)
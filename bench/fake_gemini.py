@@ -0,0 +1,201 @@
+# bench/fake_gemini.py
+"""
+Local stand-in for the Gemini REST API, for exercising modules/llm.py
+and load tests without network access or quota.
+
+Serves generateContent and streamGenerateContent (SSE) for any model,
+with configurable latency (fixed, or log-normal around a median), slow
+tail and injected errors:
+
+    python bench/fake_gemini.py --port 8765 --latency 0.2 --latency-sigma 0.5 --slow-every 10 --slow-latency 3
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake python app.py
+
+Behaviour can be changed at runtime with POST /_control (JSON with any of
+latency, latency_sigma, slow_every, slow_latency, fail_next, fail_status, error_rate)
+and inspected with GET /_stats.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DETAILS = "Name: {name}\nTagline: Ship {topic} faster\nTech Stack: Python, Flask, SQLite, Tailwind CSS"
+
+MARKDOWN = """## Summary
+A focused take on **{topic}** with a clear wedge and a B2B path.
+
+## Competitor Benchmark
+| Competitor | Offering | Strengths | Gaps |
+|---|---|---|---|
+| Alpha | Suite | Brand | Price |
+| Beta | Point tool | UX | Integrations |
+
+## Actionable Next Steps
+1. Interview 10 target customers
+2. Ship a paid pilot
+3. Measure weekly retention
+"""
+
+
+class FakeState:
+    def __init__(self, latency=0.0, slow_every=0, slow_latency=0.0, fail_status=503, error_rate=0.0,
+                 latency_sigma=0.0):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self.fail_status = fail_status
+        self.fail_next = 0
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def plan(self):
+        """(delay, error_status or None) for the next request."""
+        with self.lock:
+            self.requests += 1
+            n = self.requests
+            fail = self.fail_next > 0 or random.random() < self.error_rate
+            if self.fail_next > 0:
+                self.fail_next -= 1
+            if fail:
+                self.errors += 1
+        slow = self.slow_every and n % self.slow_every == 0
+        delay = self.latency * random.lognormvariate(0, self.latency_sigma) if self.latency_sigma else self.latency
+        return (self.slow_latency if slow else delay), (self.fail_status if fail else None)
+
+    def update(self, changes: dict):
+        with self.lock:
+            for key in ("latency", "latency_sigma", "slow_every", "slow_latency", "fail_next", "fail_status", "error_rate"):
+                if key in changes:
+                    setattr(self, key, type(getattr(self, key))(changes[key]))
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {k: getattr(self, k) for k in
+                    ("requests", "errors", "latency", "latency_sigma", "slow_every", "slow_latency", "fail_next", "error_rate")}
+
+
+def answer_for(prompt: str) -> str:
+    topic = " ".join(prompt.split()[-4:]) or "your idea"
+    if "startup name, tagline" in prompt:
+        idea = prompt.split("idea:\n", 1)[-1].split("\n", 1)[0]
+        return DETAILS.format(name=(idea.split() or ["Fake"])[0].capitalize() + "ly", topic=idea or topic)
+    if "category label" in prompt:
+        return "FinTech"
+    return MARKDOWN.format(topic=topic)
+
+def response_json(text: str, prompt: str) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {
+            "promptTokenCount": len(prompt.split()),
+            "candidatesTokenCount": len(text.split()),
+            "totalTokenCount": len(prompt.split()) + len(text.split()),
+        },
+    }
+
+
+def make_handler(state: FakeState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up (deadline, or a hedge won)
+
+        def _json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/_stats":
+                return self._json(200, state.snapshot())
+            self._json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/_control":
+                state.update(payload)
+                return self._json(200, state.snapshot())
+
+            prompt = " ".join(
+                part.get("text", "")
+                for content in payload.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            delay, error = state.plan()
+            time.sleep(delay)
+            if error:
+                return self._json(error, {"error": {"code": error, "message": "injected failure", "status": "UNAVAILABLE"}})
+
+            text = answer_for(prompt)
+            if ":streamGenerateContent" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                lines = text.splitlines(keepends=True)
+                for i in range(0, len(lines), 3):
+                    chunk = "".join(lines[i:i + 3])
+                    self.wfile.write(f"data: {json.dumps(response_json(chunk, prompt))}\r\n\r\n".encode())
+                    self.wfile.flush()
+                self.close_connection = True
+                return
+            if ":generateContent" in self.path:
+                return self._json(200, response_json(text, prompt))
+            self._json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+    return Handler
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # load tests open hundreds of connections at once
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, **options):
+    """Start the fake server in a daemon thread. Returns (server, state, base_url)."""
+    state = FakeState(**options)
+    server = FakeServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini REST server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds (median when --latency-sigma is set)")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="log-normal spread of the latency")
+    parser.add_argument("--slow-every", type=int, default=0, help="every Nth request is slow")
+    parser.add_argument("--slow-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server, _, url = serve(args.host, args.port, latency=args.latency, slow_every=args.slow_every,
+                           slow_latency=args.slow_latency, fail_status=args.fail_status,
+                           error_rate=args.error_rate, latency_sigma=args.latency_sigma)
+    print(f"✅ Fake Gemini listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
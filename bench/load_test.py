@@ -0,0 +1,351 @@
+# bench/load_test.py
+"""
+End-to-end load test.
+
+Boots the app in a subprocess, either the threaded WSGI server or asgi.py
+under uvicorn. The app talks to the fake Gemini server in
+bench/fake_gemini.py and uses a temporary SQLite database. Virtual users
+then register, log in and loop through /generate, /tool/<key>,
+/save_idea and /saved_ideas. The report covers throughput and p50/p95/p99
+latency per route. It also reports SQLite write-lock waits, sampled by a
+probe that takes the write lock (BEGIN IMMEDIATE) every few milliseconds
+during the run. Run from the repo root:
+
+    python bench/load_test.py --users 20 --duration 30 --latency 0.5 --latency-sigma 0.4 \\
+        --error-rate 0.02 --out results.json
+    python bench/load_test.py --server asgi --users 200 --duration 30 --out asgi.json
+    python bench/load_test.py --compare results.json asgi.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx
+from bench.fake_gemini import serve as serve_fake_gemini
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "load-test-password"
+TOOLS = ["market", "fundraising", "product", "mentor", "accelerators"]
+IDEAS = [
+    "AI tutor that adapts lessons for students with dyslexia",
+    "Payroll and invoicing for freelance designers in Europe",
+    "Marketplace for refurbished lab equipment",
+    "Carbon tracking dashboard for small manufacturers",
+    "Telemedicine follow-ups for physiotherapy patients",
+    "Multiplayer trivia game for remote team socials",
+    "Password manager for families with shared vaults",
+    "Meal-prep subscription for remote-first companies",
+]
+
+WSGI_SERVER = """
+import os
+from werkzeug.serving import run_simple
+from app import app
+run_simple("127.0.0.1", int(os.environ["LOAD_TEST_PORT"]), app, threaded=True)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(samples_ms, duration: float = None) -> dict:
+    values = sorted(samples_ms)
+    summary = {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0,
+        "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+    }
+    if duration:
+        summary["rps"] = round(len(values) / duration, 2)
+    return summary
+
+
+# ------------------------
+# Target process
+# ------------------------
+def start_app(server: str, port: int, env: dict, log_path: str):
+    if server == "asgi":
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-c", WSGI_SERVER]
+    log = open(log_path, "w")
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            if httpx.get(f"{base_url}/login", timeout=2).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    proc.kill()
+    with open(log_path) as f:
+        sys.exit(f"App did not start:\n{f.read()[-3000:]}")
+
+
+# ------------------------
+# Measurements
+# ------------------------
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.degraded = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def record(self, route: str, elapsed_ms: float, ok: bool, degraded: bool = False, status=None):
+        with self.lock:
+            self.latencies[route].append(elapsed_ms)
+            self.statuses[route][str(status or "transport error")] += 1
+            if not ok:
+                self.errors[route] += 1
+            if degraded:
+                self.degraded[route] += 1
+
+
+class LockProbe(threading.Thread):
+    """Samples how long it takes to acquire SQLite's write lock."""
+
+    def __init__(self, db_path: str, interval: float):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.samples = []
+        self.timeouts = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        while not self.stop.wait(self.interval):
+            t0 = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                self.timeouts += 1
+                continue
+            self.samples.append((time.perf_counter() - t0) * 1000)
+            conn.execute("COMMIT")
+        conn.close()
+
+    def report(self) -> dict:
+        summary = summarize(self.samples)
+        summary["over_10ms"] = sum(1 for s in self.samples if s > 10)
+        summary["timeouts"] = self.timeouts
+        return summary
+
+
+# ------------------------
+# Virtual users
+# ------------------------
+def virtual_user(n: int, base_url: str, recorder: Recorder, stop_at: float, args, run_tag: str):
+    rng = random.Random(args.seed + n)
+    client = httpx.Client(base_url=base_url, follow_redirects=False, timeout=args.timeout)
+
+    def call(route: str, method: str, path: str, expect=(200, 302), degraded_marker=None, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            resp = client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            recorder.record(route, (time.perf_counter() - t0) * 1000, ok=False)
+            return None
+        elapsed = (time.perf_counter() - t0) * 1000
+        degraded = bool(degraded_marker and degraded_marker in resp.text)
+        recorder.record(route, elapsed, ok=resp.status_code in expect, degraded=degraded, status=resp.status_code)
+        return resp
+
+    name = f"load_{run_tag}_{n}"
+    call("POST /register", "POST", "/register",
+         data={"username": name, "email": f"{name}@example.com", "password": PASSWORD})
+    resp = call("POST /login", "POST", "/login", data={"user_input": name, "password": PASSWORD})
+    if resp is None or resp.status_code != 302:
+        return
+
+    previous = []
+    while time.time() < stop_at:
+        if previous and rng.random() < args.repeat_ratio:
+            idea = rng.choice(previous)  # same input again: exercises the Copilot cache
+        else:
+            idea = f"{rng.choice(IDEAS)} ({run_tag}-{n}-{rng.randrange(10 ** 9)})"
+            previous.append(idea)
+
+        call("POST /generate", "POST", "/generate", data={"idea": idea}, degraded_marker="API Error")
+        call("POST /tool/<key>", "POST", f"/tool/{rng.choice(TOOLS)}", data={"user_input": idea},
+             degraded_marker="Sorry, something went wrong")
+        call("POST /save_idea", "POST", "/save_idea",
+             data={"idea": idea, "startup_name": f"Startup {n}", "tagline": "Load tested", "tech_stack": "Python, Flask"})
+        call("GET /saved_ideas", "GET", "/saved_ideas")
+        if args.think:
+            time.sleep(rng.uniform(0, 2 * args.think))
+    client.close()
+
+
+# ------------------------
+# Run / compare
+# ------------------------
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="cofounder-load-")
+    db_path = os.path.join(workdir, "database.db")
+    fake, fake_state, fake_url = serve_fake_gemini(
+        latency=args.latency, latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+        slow_every=args.slow_every, slow_latency=args.slow_latency,
+    )
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="load-test",
+        GEMINI_BASE_URL=fake_url,
+        DATABASE_PATH=db_path,
+        COPILOT_CACHE_DB=os.path.join(workdir, "copilot_cache.db"),
+        ENRICHMENT_WORKERS=str(args.enrichment_workers),
+        WARMUP_MODELS="1" if args.warmup_models else "0",
+        LOAD_TEST_PORT=str(args.port or free_port()),
+    )
+    proc, base_url = start_app(args.server, int(env["LOAD_TEST_PORT"]), env, os.path.join(workdir, "app.log"))
+
+    recorder = Recorder()
+    probe = LockProbe(db_path, args.probe_interval)
+    run_tag = datetime.now().strftime("%H%M%S")
+    started = time.time()
+    stop_at = started + args.duration
+    try:
+        probe.start()
+        users = [
+            threading.Thread(target=virtual_user, args=(n, base_url, recorder, stop_at, args, run_tag), daemon=True)
+            for n in range(args.users)
+        ]
+        for i, user in enumerate(users):
+            user.start()
+            if args.ramp_up:
+                time.sleep(args.ramp_up / args.users)
+        for user in users:
+            user.join(args.duration + args.timeout + 30)
+        elapsed = time.time() - started
+    finally:
+        probe.stop.set()
+        probe.join(5)
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        fake.shutdown()
+
+    routes = {}
+    for route, samples in sorted(recorder.latencies.items()):
+        routes[route] = dict(summarize(samples, elapsed), errors=recorder.errors[route],
+                             degraded=recorder.degraded[route], status_codes=dict(recorder.statuses[route]))
+    total = sum(len(s) for s in recorder.latencies.values())
+    results = {
+        "started_at": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "keep")},
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(recorder.errors.values()),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "routes": routes,
+        "db_lock_wait": probe.report(),
+        "upstream": fake_state.snapshot(),
+    }
+    if args.keep:
+        results["workdir"] = workdir
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def print_results(results: dict):
+    print(f"\n{results['requests']} requests in {results['duration_s']}s "
+          f"= {results['throughput_rps']} req/s, {results['errors']} errors")
+    print(f"{'route':20} {'count':>7} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>5} {'degr':>5}")
+    for route, r in results["routes"].items():
+        print(f"{route:20} {r['count']:7} {r['rps']:7} {r['p50_ms']:9} {r['p95_ms']:9} {r['p99_ms']:9} "
+              f"{r['errors']:5} {r['degraded']:5}")
+    lock = results["db_lock_wait"]
+    print(f"DB write-lock wait: p50 {lock['p50_ms']} ms, p99 {lock['p99_ms']} ms, max {lock['max_ms']} ms, "
+          f"{lock['over_10ms']}/{lock['count']} samples over 10 ms, {lock['timeouts']} timeouts")
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def delta(a, b):
+        return f"{(b - a) / a * 100:+.0f}%" if a else "n/a"
+
+    print(f"throughput: {before['throughput_rps']} -> {after['throughput_rps']} req/s "
+          f"({delta(before['throughput_rps'], after['throughput_rps'])})")
+    print(f"{'route':20} {'p50 ms':>22} {'p95 ms':>22} {'p99 ms':>22}")
+    for route in sorted(set(before["routes"]) | set(after["routes"])):
+        a, b = before["routes"].get(route), after["routes"].get(route)
+        if not a or not b:
+            print(f"{route:20} only in {'after' if b else 'before'}")
+            continue
+        cells = [f"{a[k]} -> {b[k]} ({delta(a[k], b[k])})" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{route:20} " + " ".join(f"{c:>22}" for c in cells))
+    a, b = before["db_lock_wait"], after["db_lock_wait"]
+    print(f"DB write-lock wait p99: {a['p99_ms']} -> {b['p99_ms']} ms ({delta(a['p99_ms'], b['p99_ms'])})")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against a fake Gemini")
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=0, help="seconds to start all users")
+    parser.add_argument("--think", type=float, default=0, help="mean think time between requests (s)")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="share of iterations reusing an earlier input")
+    parser.add_argument("--timeout", type=float, default=60, help="client timeout per request (s)")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake Gemini median latency (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="log-normal spread of the latency")
+    parser.add_argument("--slow-every", type=int, default=0)
+    parser.add_argument("--slow-latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake Gemini requests failing with 503")
+    parser.add_argument("--enrichment-workers", type=int, default=0, help="0 keeps the ML models out of the run")
+    parser.add_argument("--warmup-models", action="store_true")
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="seconds between lock probes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary database and app log")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(args)
+    print_results(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
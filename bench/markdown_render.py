@@ -0,0 +1,130 @@
+# bench/markdown_render.py
+"""
+Micro-benchmark for Copilot markdown rendering.
+
+Compares the old per-call path (import + new Converter every time) with
+the reusable converters in modules/render.py, the cmark backend when
+installed, and a warm render cache, on Copilot-shaped answers with
+tables. Run from the repo root:
+
+    python bench/markdown_render.py --iterations 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import render
+
+MARKET = """## Summary
+Fresh-meal subscription for remote teams: **high intent**, crowded space, winnable via B2B payroll perks.
+
+## Market Trends
+- Hybrid work keeps *lunch budgets* per employee flat but fragmented
+- Employers shift perks from offices to stipends
+- Meal-kit churn pushes buyers toward prepared meals
+- Local kitchens want predictable weekday volume
+
+## ICP & Customer Insights
+- People ops leads at 50–500 person remote-first companies
+- Budget owner: HR; champion: office/experience manager
+- Pain: reimbursements are manual and uneven across cities
+
+## Competitor Benchmark
+| Competitor | Offering | Strengths | Gaps |
+|---|---|---|---|
+| Forkable | Catered office lunches | Enterprise logos, scheduling | Weak remote coverage |
+| Sharebite | Group ordering | Restaurant network | Office-centric |
+| DoorDash for Work | Meal credits | Coverage, brand | Generic, no nutrition focus |
+| Factor | Prepared meals | Quality, logistics | Consumer-only billing |
+| ezCater | Catering marketplace | Breadth | Events, not daily meals |
+
+## Risks & Mitigations
+- **Unit economics** — start in 3 dense metros, batch deliveries
+- **Procurement cycles** — self-serve pilot with card billing
+- **Food safety** — partner only with licensed commercial kitchens
+
+## Actionable Next Steps
+1. Interview 15 people-ops leads; validate stipend budgets
+2. Sign 2 kitchen partners in one metro
+3. Run a 4-week paid pilot with 3 companies
+4. Instrument weekly active eaters and reorder rate
+"""
+
+PRODUCT = """## MVP Scope
+- Team admin invites employees and sets a weekly budget
+- Employees pick meals before **Sunday 6pm**
+- Acceptance: 95% on-time delivery, < 2 min to place an order
+
+## Architecture Sketch
+Web app → API → order service → kitchen routing → courier webhook
+
+## Tech Stack Options
+| Layer | Option | Why | Trade-offs |
+|---|---|---|---|
+| Frontend | Next.js | SSR, fast iteration | Vendor gravity |
+| Backend | Flask | Team knows Python | Less structure |
+| Database | Postgres | Relational orders | Ops overhead |
+| Payments | Stripe | Invoicing + cards | Fees |
+| Queue | Redis + RQ | Simple jobs | Not durable by default |
+
+## North Star Metric & KPIs
+- **Weekly meals delivered per active company**
+- Activation: % invited employees ordering in week 1
+- Retention: 8-week company retention
+
+## Experiment Backlog
+| # | Hypothesis | Metric | Effort | Impact |
+|---|---|---|---|---|
+| 1 | Budget nudges raise orders | Orders/employee | S | M |
+| 2 | Dietary filters lift activation | Week-1 activation | M | H |
+| 3 | Slack ordering beats web | Order completion | M | H |
+| 4 | Team-wide Friday treats | Friday AOV | S | M |
+| 5 | Annual prepay discount | Cash collected | S | H |
+"""
+
+DOCS = [MARKET, PRODUCT, MARKET.replace("remote", "hybrid"), PRODUCT.replace("Flask", "FastAPI")]
+
+
+def legacy(md_text: str) -> str:
+    import markdown
+    return markdown.markdown(md_text, extensions=render.MARKDOWN_EXTENSIONS)
+
+def timeit(fn, iterations: int):
+    samples = []
+    for i in range(iterations):
+        doc = DOCS[i % len(DOCS)]
+        t0 = time.perf_counter()
+        fn(doc)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    cases = [
+        ("legacy (new Markdown per call)", legacy),
+        ("markdown (reused converter)", lambda d: render._render_markdown(d)),
+    ]
+    try:
+        import cmarkgfm  # noqa: F401
+        cases.append(("cmark", lambda d: render._render_cmark(d)))
+    except ImportError:
+        print("cmarkgfm not installed; skipping cmark backend")
+    render.render_cache.clear()
+    cases.append((f"cached ({render.backend_name}, warm)", lambda d: render.markdown_to_html(d)))
+
+    print(f"{'renderer':34} {'p50 us':>10} {'p99 us':>10}")
+    for name, fn in cases:
+        for doc in DOCS:  # warm imports / per-thread converters / cache
+            fn(doc)
+        p50, p99 = timeit(fn, args.iterations)
+        print(f"{name:34} {p50:10.1f} {p99:10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench/resilience_check.py
+"""
+Exercises modules/llm.py against the local fake server (bench/fake_gemini.py)
+through the real Gemini SDK: success, retry of transient 503s, deadline,
+circuit breaker with fallback, and hedging of a slow tail. Run from the
+repo root:
+
+    python bench/resilience_check.py
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google import genai
+from bench.fake_gemini import serve
+from modules.llm import ResilientGemini, CircuitBreaker, CircuitOpenError, LLMTimeoutError
+
+MODEL = "gemini-1.5-flash"
+
+
+def make(base_url: str, **options) -> ResilientGemini:
+    client = genai.Client(api_key="fake", http_options={"base_url": base_url})
+    options.setdefault("backoff_base", 0.05)
+    return ResilientGemini(lambda: client, MODEL, **options)
+
+def check(name: str, ok: bool, detail: str = ""):
+    print(f"{'PASS' if ok else 'FAIL'}  {name}  {detail}")
+    return ok
+
+def main():
+    server, state, url = serve()
+    results = []
+
+    llm = make(url)
+    resp = llm.generate("Generate a startup name, tagline, and short tech stack for this idea:\nmeal kits\n")
+    results.append(check("plain call", resp.text.startswith("Name: Meal"), repr(resp.text[:30])))
+
+    chunks = [c.text for c in llm.stream("market analysis for meal kits")]
+    results.append(check("stream", len(chunks) > 1 and "Competitor" in "".join(chunks), f"{len(chunks)} chunks"))
+
+    state.update({"fail_next": 2})
+    llm = make(url, max_attempts=3)
+    resp = llm.generate("market analysis")
+    results.append(check("retries transient 503s", llm.stats["retries"] == 2 and bool(resp.text), str(llm.stats)))
+
+    state.update({"latency": 2.0})
+    llm = make(url, timeout=0.5)
+    t0 = time.perf_counter()
+    try:
+        llm.generate("market analysis")
+        timed_out = False
+    except LLMTimeoutError:
+        timed_out = True
+    except Exception as e:  # the SDK's own timeout may fire first
+        timed_out = "timeout" in type(e).__name__.lower() or "timed out" in str(e).lower()
+    elapsed = time.perf_counter() - t0
+    results.append(check("deadline", timed_out and elapsed < 0.8, f"{elapsed:.2f}s"))
+    state.update({"latency": 0.0})
+
+    state.update({"error_rate": 1.0})
+    llm = make(url, max_attempts=1, breaker=CircuitBreaker(threshold=3, reset_seconds=0.5))
+    for _ in range(3):
+        try:
+            llm.generate("market analysis")
+        except Exception:
+            pass
+    before = state.snapshot()["requests"]
+    t0 = time.perf_counter()
+    try:
+        llm.generate("market analysis")
+        opened = False
+    except CircuitOpenError:
+        opened = True
+    fast = time.perf_counter() - t0
+    untouched = state.snapshot()["requests"] == before
+    results.append(check("circuit opens and fails fast", opened and untouched and fast < 0.01, f"{fast * 1000:.2f} ms"))
+    state.update({"error_rate": 0.0})
+    time.sleep(0.6)
+    resp = llm.generate("market analysis")
+    results.append(check("circuit closes after probe", llm.breaker.state == "closed" and bool(resp.text)))
+
+    state.update({"slow_every": 4, "slow_latency": 1.0, "latency": 0.02})
+    def p99(llm):
+        samples = []
+        for _ in range(24):
+            t0 = time.perf_counter()
+            llm.generate("market analysis")
+            samples.append(time.perf_counter() - t0)
+        return max(samples), statistics.median(samples)
+    plain_max, plain_p50 = p99(make(url))
+    hedged = make(url, hedge_after=0.1)
+    hedged_max, hedged_p50 = p99(hedged)
+    results.append(check(
+        "hedging cuts the slow tail", hedged_max < plain_max / 2,
+        f"max {plain_max:.2f}s -> {hedged_max:.2f}s, p50 {plain_p50:.3f}s -> {hedged_p50:.3f}s, "
+        f"{hedged.stats['hedges']} hedges",
+    ))
+
+    server.shutdown()
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
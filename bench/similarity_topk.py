@@ -0,0 +1,43 @@
+# bench/similarity_topk.py
+"""
+Top-k latency of ml.similarity.VectorSet on random unit vectors.
+
+    python bench/similarity_topk.py --n 100000 --dim 768 --k 5
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.similarity import VectorSet
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vs = VectorSet(args.dim)
+    t0 = time.perf_counter()
+    for start in range(0, args.n, 10_000):
+        chunk = min(10_000, args.n - start)
+        vs.upsert(range(start, start + chunk), rng.standard_normal((chunk, args.dim), dtype=np.float32))
+    build = time.perf_counter() - t0
+
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    timings = []
+    for q in queries:
+        t0 = time.perf_counter()
+        vs.search(q, args.k)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    print(f"index build: {build:.2f}s for {args.n} x {args.dim}")
+    print(f"top-{args.k}: p50 {np.percentile(timings, 50):.2f} ms  p99 {np.percentile(timings, 99):.2f} ms")
+
+if __name__ == "__main__":
+    main()
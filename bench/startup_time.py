@@ -0,0 +1,61 @@
+# bench/startup_time.py
+"""
+Cold-start benchmark for the web process.
+
+Each run starts a fresh interpreter, imports app.py and serves GET /login
+through the Flask test client, reporting import time and time to first
+response. Run from the repo root:
+
+    python bench/startup_time.py --runs 5 [--warmup] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import time, json
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+resp = app.app.test_client().get("/login")
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "first_response_s": t2 - t0, "status": resp.status_code}))
+"""
+
+def run_once(warmup: bool) -> dict:
+    env = dict(os.environ, WARMUP_MODELS="1" if warmup else "0")
+    env.setdefault("GEMINI_API_KEY", "bench-placeholder")
+    out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="start the background model warm-up")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = [run_once(args.warmup) for _ in range(args.runs)]
+    summary = {
+        key: {
+            "median": statistics.median(r[key] for r in results),
+            "min": min(r[key] for r in results),
+            "max": max(r[key] for r in results),
+        }
+        for key in ("import_s", "first_response_s")
+    }
+    summary["runs"] = results
+    summary["warmup"] = args.warmup
+
+    for key in ("import_s", "first_response_s"):
+        s = summary[key]
+        print(f"{key:>18}: median {s['median']*1000:7.1f} ms  (min {s['min']*1000:.1f}, max {s['max']*1000:.1f})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
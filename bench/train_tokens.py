@@ -0,0 +1,167 @@
+# bench/train_tokens.py
+"""
+Training-throughput benchmark for the data pipeline in ml/data.py.
+
+Compares the old recipe (pandas + padding="max_length" to 256, random
+batches) with the new one (streamed CSV, cached tokenization, length-
+bucketed batches, per-batch dynamic padding). For each recipe it reports
+tokenization time and training tokens per second. "Real" tokens are the
+non-pad ones; "padded" tokens are everything the model processes.
+
+Works offline: the corpus is synthetic (startup ideas with a long-tailed
+length distribution), the WordPiece tokenizer is trained on it, and the
+DistilBERT-sized model is randomly initialised. Run from the repo root:
+
+    python bench/train_tokens.py --rows 4000 --steps 8 [--layers 6] [--json out.json]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+import torch
+from datasets import Dataset
+from tokenizers import BertWordPieceTokenizer
+from torch.utils.data import DataLoader, RandomSampler
+from transformers import (PreTrainedTokenizerFast, DistilBertConfig, DistilBertForSequenceClassification,
+                          default_data_collator)
+from transformers.trainer_pt_utils import LengthGroupedSampler
+from ml import data
+from ml.train_sentiment import label2id
+
+WORDS = ("ai platform marketplace for small businesses that automates invoicing payroll and tax "
+         "filing with a mobile app connecting freelancers designers students patients clinics "
+         "restaurants farmers to local suppliers using machine learning analytics dashboards "
+         "subscription pricing secure cloud storage real time collaboration and community").split()
+SENTIMENTS = list(label2id)
+
+
+def write_corpus(path: str, rows: int, rng: random.Random):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "sentiment"])
+        for _ in range(rows):
+            # Most ideas are a sentence; a few are pasted paragraphs
+            n = max(3, min(400, int(rng.lognormvariate(2.6, 0.6))))
+            writer.writerow([" ".join(rng.choice(WORDS) for _ in range(n)), rng.choice(SENTIMENTS)])
+
+def build_tokenizer(corpus: str, workdir: str) -> PreTrainedTokenizerFast:
+    wp = BertWordPieceTokenizer(lowercase=True)
+    wp.train([corpus], vocab_size=2000, min_frequency=1)
+    wp.save(os.path.join(workdir, "tokenizer.json"))
+    return PreTrainedTokenizerFast(
+        tokenizer_file=os.path.join(workdir, "tokenizer.json"), unk_token="[UNK]", pad_token="[PAD]",
+        cls_token="[CLS]", sep_token="[SEP]", mask_token="[MASK]", model_max_length=data.MAX_LENGTH,
+    )
+
+def old_pipeline(corpus: str, tokenizer):
+    """The previous train_sentiment.py data path."""
+    from sklearn.model_selection import train_test_split
+    df = pd.read_csv(corpus)
+    df["label"] = df["sentiment"].map(label2id)
+    train_df, _ = train_test_split(df, test_size=0.2, random_state=42)
+    ds = Dataset.from_pandas(train_df[["text", "label"]])
+    ds = ds.map(lambda x: tokenizer(x["text"], truncation=True, padding="max_length", max_length=256), batched=True)
+    ds = ds.remove_columns(["text"])
+    ds.set_format("torch")
+    return ds
+
+def new_pipeline(corpus: str, tokenizer, cache_dir: str):
+    rows = lambda: ({"text": r["text"], "label": label2id[r["sentiment"]]} for r in data.iter_csv(corpus))
+    return data.tokenized_splits("bench", rows, [corpus], tokenizer, cache_dir=cache_dir)["train"]
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+def train_steps(model, loader, steps: int, pad_id: int) -> dict:
+    optimizer = torch.optim.AdamW(model.parameters(), lr=3e-5)
+    model.train()
+    real = padded = 0
+    batches = iter(loader)
+    next_batch = lambda: {k: v for k, v in next(batches).items() if k in ("input_ids", "attention_mask", "labels")}
+    # One untimed step so allocator warm-up does not count against either recipe
+    model(**next_batch()).loss.backward()
+    optimizer.zero_grad()
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        batch = next_batch()
+        model(**batch).loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        padded += batch["input_ids"].numel()
+        real += int((batch["input_ids"] != pad_id).sum())
+    elapsed = time.perf_counter() - t0
+    return {
+        "steps": steps, "seconds": round(elapsed, 2),
+        "real_tokens_per_s": round(real / elapsed, 1), "padded_tokens_per_s": round(padded / elapsed, 1),
+        "pad_fraction": round(1 - real / padded, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--steps", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--layers", type=int, default=6, help="DistilBERT has 6")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    torch.manual_seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="train-tokens-")
+    try:
+        corpus = os.path.join(workdir, "ideas.csv")
+        write_corpus(corpus, args.rows, rng)
+        tokenizer = build_tokenizer(corpus, workdir)
+        cache_dir = os.path.join(workdir, "cache")
+
+        old_ds, old_tok_s = timed(old_pipeline, corpus, tokenizer)
+        new_ds, new_tok_s = timed(new_pipeline, corpus, tokenizer, cache_dir)
+        _, cached_tok_s = timed(new_pipeline, corpus, tokenizer, cache_dir)
+
+        config = DistilBertConfig(vocab_size=tokenizer.vocab_size, n_layers=args.layers, num_labels=3)
+        model = DistilBertForSequenceClassification(config)
+        # Enough batches for the warm-up step plus the timed ones
+        needed = (args.steps + 1) * args.batch_size
+        old_loader = DataLoader(old_ds, batch_size=args.batch_size, collate_fn=default_data_collator,
+                                sampler=RandomSampler(old_ds, num_samples=needed))
+        sampler = LengthGroupedSampler(args.batch_size, lengths=new_ds["length"],
+                                       generator=torch.Generator().manual_seed(args.seed))
+        new_loader = DataLoader(new_ds.remove_columns(["length"]), batch_size=args.batch_size,
+                                collate_fn=data.collator(tokenizer), sampler=sampler)
+
+        results = {
+            "rows": args.rows, "batch_size": args.batch_size, "layers": args.layers,
+            "mean_tokens_per_text": round(sum(new_ds["length"]) / len(new_ds), 1),
+            "tokenize_s": {"before": round(old_tok_s, 2), "after_cold": round(new_tok_s, 2),
+                           "after_cached": round(cached_tok_s, 2)},
+            "before": train_steps(model, old_loader, args.steps, tokenizer.pad_token_id),
+            "after": train_steps(model, new_loader, args.steps, tokenizer.pad_token_id),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    before, after = results["before"], results["after"]
+    print(f"rows={args.rows}  mean tokens/text={results['mean_tokens_per_text']}  batch={args.batch_size}")
+    print(f"tokenize: before {results['tokenize_s']['before']}s, after {results['tokenize_s']['after_cold']}s "
+          f"(cold) / {results['tokenize_s']['after_cached']}s (cached)")
+    for name, r in (("before", before), ("after", after)):
+        print(f"{name:>6}: {r['real_tokens_per_s']:>9.1f} real tokens/s  "
+              f"({r['padded_tokens_per_s']:.1f} incl. padding, {r['pad_fraction']:.0%} pad)")
+    print(f"speedup (real tokens/s): {after['real_tokens_per_s'] / before['real_tokens_per_s']:.1f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
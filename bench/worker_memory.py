@@ -0,0 +1,170 @@
+# bench/worker_memory.py
+"""
+Per-worker memory of pre-forked web workers, with and without preload.
+
+Mimics gunicorn: a master process forks --workers children, each scores
+--requests batches of ideas through ml/infer.py and then reports its
+memory from /proc/<pid>/smaps_rollup:
+  PSS - proportional set size: shared pages are split between the
+        processes sharing them, so the PSS of all processes adds up to
+        what they really use together
+  USS - pages private to the process
+  RSS - everything mapped in, shared or not
+
+    lazy     - every worker loads its own copy of the models (no preload)
+    preload  - the master loads, warms and freezes them before forking
+               (modules/preload.py, what gunicorn.conf.py does)
+
+Works offline: DistilBERT-sized sentiment and topic models with random
+weights are written to a temporary directory. Linux only. Run from the
+repo root:
+
+    python bench/worker_memory.py --workers 3 [--layers 6] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+MODES = ("lazy", "preload")
+
+
+def smaps(pid: int) -> dict:
+    """Memory of a process in MiB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    mib = lambda kb: round(kb / 1024, 1)
+    return {"pss": mib(fields["Pss"]), "uss": mib(fields["Private_Clean"] + fields["Private_Dirty"]),
+            "rss": mib(fields["Rss"])}
+
+def build_models(workdir: str, layers: int):
+    import torch
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification
+    from bench.train_tokens import write_corpus, build_tokenizer
+    from ml.labels import TOPIC_LABELS
+    corpus = os.path.join(workdir, "ideas.csv")
+    write_corpus(corpus, 500, random.Random(0))
+    tokenizer = build_tokenizer(corpus, workdir)
+    for path, kwargs in (("ml/sentiment_model", {"num_labels": 3}),
+                         ("ml/topic_model", {"num_labels": len(TOPIC_LABELS),
+                                             "problem_type": "multi_label_classification"})):
+        # Full DistilBERT width; the vocabulary is small, so most weights are in the layers
+        config = DistilBertConfig(vocab_size=tokenizer.vocab_size, n_layers=layers, **kwargs)
+        torch.manual_seed(0)
+        DistilBertForSequenceClassification(config).save_pretrained(os.path.join(workdir, path))
+        tokenizer.save_pretrained(os.path.join(workdir, path))
+
+def run_mode(mode: str, workers: int, requests: int, batch_size: int) -> dict:
+    """One master and its workers; runs in a fresh interpreter, cwd = the model directory."""
+    from bench.train_tokens import WORDS
+    import ml.infer
+    from modules import preload
+
+    master = {"before_preload": smaps(os.getpid())}
+    if mode == "preload":
+        master["loaded"] = preload.preload()
+    master["at_fork"] = smaps(os.getpid())
+
+    rng = random.Random(0)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 60))) for _ in range(batch_size)]
+    children = []
+    for _ in range(workers):
+        ready_r, ready_w = os.pipe()
+        go_r, go_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(ready_r)
+                os.close(go_w)
+                preload.configure_worker(workers)
+                started = time.perf_counter()
+                for _ in range(requests):
+                    ml.infer.predict_all_batch(texts)
+                    ml.infer.embed_batch(texts[:4])
+                os.write(ready_w, json.dumps({"seconds": round(time.perf_counter() - started, 2)}).encode())
+                os.read(go_r, 1)  # stay alive until measured
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+            finally:
+                os._exit(0)
+        os.close(ready_w)
+        os.close(go_r)
+        children.append((pid, ready_r, go_w))
+
+    result = {"mode": mode, "workers": [], "master": master}
+    for pid, ready_r, _ in children:
+        reply = os.read(ready_r, 4096)
+        if not reply:
+            raise RuntimeError(f"worker {pid} failed (traceback above)")
+        stats = json.loads(reply)
+        result["workers"].append(dict(stats, pid=pid))
+    # Measure once every worker has finished, so each sees the others' sharing
+    for w in result["workers"]:
+        w.update(smaps(w["pid"]))
+    master["after_workers"] = smaps(os.getpid())
+    for pid, _, go_w in children:
+        os.write(go_w, b"x")
+        os.waitpid(pid, 0)
+
+    pss = [w["pss"] for w in result["workers"]]
+    result["worker_pss_mean"] = round(sum(pss) / len(pss), 1)
+    result["total_pss"] = round(sum(pss) + master["after_workers"]["pss"], 1)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=5, help="batches scored per worker")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--layers", type=int, default=6, help="DistilBERT has 6")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)  # internal: one run
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.workers, args.requests, args.batch_size)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="worker-memory-")
+    try:
+        build_models(workdir, args.layers)
+        env = dict(os.environ, PYTHONPATH=ROOT, HF_HUB_OFFLINE="1", INFER_RELOAD_SECONDS="0",
+                   MODEL_REGISTRY_DIR=os.path.join(workdir, "registry"))
+        results = {"workers": args.workers, "layers": args.layers, "cpus": os.cpu_count()}
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--workers", str(args.workers),
+                 "--requests", str(args.requests), "--batch-size", str(args.batch_size)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True,
+            )
+            results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"workers={args.workers}  layers={args.layers}  cpus={results['cpus']}  (MiB)")
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:>8}: per-worker PSS {r['worker_pss_mean']:>7.1f}  "
+              f"USS {sum(w['uss'] for w in r['workers']) / len(r['workers']):>7.1f}  "
+              f"RSS {sum(w['rss'] for w in r['workers']) / len(r['workers']):>7.1f}  "
+              f"| master PSS {r['master']['after_workers']['pss']:>7.1f}  total PSS {r['total_pss']:>7.1f}")
+    saved = results["lazy"]["total_pss"] - results["preload"]["total_pss"]
+    print(f"preload saves {saved:.1f} MiB in total ({saved / args.workers:.1f} MiB per worker)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# gunicorn.conf.py
+"""
+Production serving with pre-forked workers:
+
+    pip install gunicorn
+    gunicorn            # picks up this file from the working directory
+
+PRELOAD_MODELS=1 (the default here) imports app.py and loads the models
+once in the master, so all workers share one copy of the weights
+(modules/preload.py). PRELOAD_MODELS=0 gives every worker its own copy.
+"""
+import gc
+import os
+
+os.environ.setdefault("PRELOAD_MODELS", "1")
+
+wsgi_app = "app:app"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+# Threads per worker: most request time is spent waiting on Gemini
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+preload_app = os.environ["PRELOAD_MODELS"] == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        from modules import preload
+        preload.preload()
+
+def pre_fork(server, worker):
+    # Anything the master allocated since preload() joins the frozen generation
+    gc.freeze()
+
+def post_fork(server, worker):
+    from modules import preload
+    preload.configure_worker(server.cfg.workers)
+
+def post_worker_init(worker):
+    if preload_app:
+        import app
+        app.start_background_work()
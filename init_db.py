@@ -1,7 +1,169 @@
 import sqlite3
 
-def init_db():
-    conn = sqlite3.connect('database.db')
+# ------------------------
+# Schema migrations
+# ------------------------
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    # 1: keyset pagination of a user's saved ideas (newest first)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_saved_ideas_user_created ON saved_ideas(user_id, created_at)",
+    ],
+    # 2: durable queue for background sentiment/label enrichment; jobs are deleted once finished
+    [
+        "ALTER TABLE saved_ideas ADD COLUMN enrichment_status TEXT NOT NULL DEFAULT 'done'",
+        """
+        CREATE TABLE IF NOT EXISTS enrichment_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idea_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            locked_by TEXT,
+            locked_at REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_status ON enrichment_jobs(status, id)",
+    ],
+    # 3: full-text search over saved ideas, kept in sync by triggers
+    [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS saved_ideas_fts USING fts5(
+            idea, startup_name, tagline, tech_stack,
+            content='saved_ideas', content_rowid='id',
+            tokenize='porter unicode61', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS saved_ideas_fts_insert AFTER INSERT ON saved_ideas BEGIN
+            INSERT INTO saved_ideas_fts(rowid, idea, startup_name, tagline, tech_stack)
+            VALUES (new.id, new.idea, new.startup_name, new.tagline, new.tech_stack);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS saved_ideas_fts_delete AFTER DELETE ON saved_ideas BEGIN
+            INSERT INTO saved_ideas_fts(saved_ideas_fts, rowid, idea, startup_name, tagline, tech_stack)
+            VALUES ('delete', old.id, old.idea, old.startup_name, old.tagline, old.tech_stack);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS saved_ideas_fts_update
+        AFTER UPDATE OF idea, startup_name, tagline, tech_stack ON saved_ideas BEGIN
+            INSERT INTO saved_ideas_fts(saved_ideas_fts, rowid, idea, startup_name, tagline, tech_stack)
+            VALUES ('delete', old.id, old.idea, old.startup_name, old.tagline, old.tech_stack);
+            INSERT INTO saved_ideas_fts(rowid, idea, startup_name, tagline, tech_stack)
+            VALUES (new.id, new.idea, new.startup_name, new.tagline, new.tech_stack);
+        END
+        """,
+        "INSERT INTO saved_ideas_fts(saved_ideas_fts) VALUES ('rebuild')",
+    ],
+    # 4: float16 idea embeddings for similarity search
+    [
+        """
+        CREATE TABLE IF NOT EXISTS idea_embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idea_id INTEGER NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            model_version TEXT NOT NULL,
+            vector BLOB NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_idea_embeddings_user ON idea_embeddings(user_id, id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS saved_ideas_embeddings_delete AFTER DELETE ON saved_ideas BEGIN
+            DELETE FROM idea_embeddings WHERE idea_id = old.id;
+        END
+        """,
+    ],
+    # 5: history of Copilot tool runs (bodies compressed, see modules/runs.py)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS copilot_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            tool_key TEXT NOT NULL,
+            input TEXT NOT NULL,
+            markdown BLOB NOT NULL,
+            markdown_codec TEXT NOT NULL DEFAULT 'plain',
+            html BLOB NOT NULL,
+            html_codec TEXT NOT NULL DEFAULT 'plain',
+            model TEXT,
+            latency_ms INTEGER,
+            prompt_tokens INTEGER,
+            output_tokens INTEGER,
+            cached INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_copilot_runs_user ON copilot_runs(user_id, id)",
+    ],
+    # 6: change counter on saved ideas, the watermark for incremental training (ml/train_incremental.py)
+    [
+        "ALTER TABLE saved_ideas ADD COLUMN revision INTEGER NOT NULL DEFAULT 0",
+        "UPDATE saved_ideas SET revision = id",
+        "CREATE INDEX IF NOT EXISTS idx_saved_ideas_revision ON saved_ideas(revision)",
+        """
+        CREATE TRIGGER IF NOT EXISTS saved_ideas_revision_insert AFTER INSERT ON saved_ideas BEGIN
+            UPDATE saved_ideas SET revision = (SELECT MAX(revision) FROM saved_ideas) + 1 WHERE id = new.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS saved_ideas_revision_update
+        AFTER UPDATE OF idea, sentiment, label ON saved_ideas
+        WHEN old.idea IS NOT new.idea
+          OR (new.model_version IS 'user' AND (old.sentiment IS NOT new.sentiment OR old.label IS NOT new.label))
+        BEGIN
+            UPDATE saved_ideas SET revision = (SELECT MAX(revision) FROM saved_ideas) + 1 WHERE id = new.id;
+        END
+        """,
+    ],
+    # 7: which model versions scored each idea (ml.infer.scoring_version(), or 'user' for labels set by hand),
+    #    so re-scoring can skip current rows
+    [
+        "ALTER TABLE saved_ideas ADD COLUMN model_version TEXT",
+    ],
+]
+
+def migrate_db(path="database.db"):
+    """
+    Apply pending MIGRATIONS one transaction at a time. Safe to call from
+    several processes at once: the version is re-read under the write lock.
+    """
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30)  # explicit BEGIN/COMMIT below
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.execute("COMMIT")
+                break
+            try:
+                for statement in MIGRATIONS[version]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"✅ Applied migration {version + 1}")
+    finally:
+        conn.close()
+
+
+def reindex_search(path="database.db"):
+    """Rebuild the full-text index from saved_ideas (e.g. after a bulk import)."""
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO saved_ideas_fts(saved_ideas_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO saved_ideas_fts(saved_ideas_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    print("✅ Rebuilt saved ideas search index")
+
+
+def init_db(path='database.db'):
+    conn = sqlite3.connect(path)
     c = conn.cursor()
 
     # Enable foreign key constraints
@@ -76,5 +238,9 @@ def update_db():
 
 
 if __name__ == '__main__':
+    import sys
     init_db()
     update_db()
+    migrate_db()
+    if "--reindex-search" in sys.argv:
+        reindex_search()
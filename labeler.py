@@ -1,14 +1,134 @@
 # labeler.py
+"""
+Keyword rule engine for startup-idea topics.
+
+Every category in ml/labels.py has a list of keywords and phrases. They
+are compiled once into a single word-boundary regex with one named group
+per category, so a text is scanned in one pass ("ai" no longer matches
+inside "email" or "maintain"). Used as the zero-latency fallback when
+the transformer models in ml/infer.py are unavailable.
+"""
+import math
+import re
+from ml.labels import TOPIC_LABELS
+
+DEFAULT_LABEL = "General"
+
+# Phrases score their word count, so "machine learning" outweighs "learning".
+KEYWORDS = {
+    "AI/ML": [
+        "ai", "a.i.", "artificial intelligence", "machine learning", "ml", "deep learning",
+        "neural network", "llm", "llms", "gpt", "chatbot", "computer vision", "nlp",
+        "natural language processing", "generative", "predictive model", "recommendation engine",
+    ],
+    "Fintech": [
+        "fintech", "finance", "financial", "payment", "payments", "banking", "bank", "loan",
+        "lending", "credit", "invoice", "invoicing", "budget", "budgeting", "crypto",
+        "cryptocurrency", "blockchain", "wallet", "insurance", "investing", "investment",
+        "stock", "trading", "accounting", "payroll",
+    ],
+    "Healthcare": [
+        "health", "healthcare", "healthtech", "medical", "medicine", "doctor", "patient",
+        "hospital", "clinic", "clinical", "telemedicine", "mental health", "therapy",
+        "fitness", "wellness", "diagnosis", "pharmacy", "nutrition",
+    ],
+    "EdTech": [
+        "edtech", "education", "educational", "learning platform", "online course", "course",
+        "student", "teacher", "school", "university", "tutor", "tutoring", "classroom",
+        "e-learning", "exam", "curriculum",
+    ],
+    "E-commerce": [
+        "e-commerce", "ecommerce", "online store", "shop", "shopping", "marketplace",
+        "retail", "checkout", "cart", "dropshipping", "seller", "buyer", "delivery",
+    ],
+    "Productivity": [
+        "productivity", "task management", "to-do", "todo", "calendar", "scheduling",
+        "note-taking", "notes", "workflow", "time tracking", "reminder", "focus",
+        "collaboration",
+    ],
+    "SaaS": [
+        "saas", "software as a service", "subscription", "b2b", "dashboard", "crm", "erp",
+        "platform for businesses", "multi-tenant", "api", "apis",
+    ],
+    "DevTools": [
+        "devtools", "developer", "developers", "ide", "code review", "debugging", "ci/cd",
+        "deployment", "git", "github", "sdk", "sdks", "open source", "devops", "testing framework",
+        "compiler", "no-code", "low-code",
+    ],
+    "Marketing": [
+        "marketing", "seo", "advertising", "ads", "campaign", "influencer", "branding",
+        "email marketing", "lead generation", "social media marketing", "content marketing",
+        "analytics", "growth hacking",
+    ],
+    "Gaming": [
+        "game", "games", "gaming", "gamer", "esports", "multiplayer", "vr", "virtual reality",
+        "ar", "augmented reality", "metaverse", "game engine",
+    ],
+    "Social": [
+        "social", "social network", "social media", "community", "dating", "friends",
+        "messaging", "chat", "forum", "followers", "creator", "creators",
+    ],
+    "Cybersecurity": [
+        "cybersecurity", "security", "privacy", "encryption", "malware", "phishing",
+        "vulnerability", "authentication", "password", "firewall", "fraud detection",
+        "threat detection", "zero trust",
+    ],
+    "Climate": [
+        "climate", "carbon", "emissions", "sustainability", "sustainable", "renewable",
+        "solar", "wind energy", "green energy", "recycling", "ev", "evs", "electric vehicle",
+        "clean energy", "net zero", "waste",
+    ],
+}
+
+
+_SEPARATORS = re.compile(r"[\s\-]+")
+
+def _term_pattern(term: str) -> str:
+    # Inner spaces match any run of whitespace or hyphens ("machine-learning")
+    words = term.lower().split()
+    pattern = r"[\s\-]+".join(re.escape(w) for w in words)
+    # Simple plurals only for words long enough not to collide with other
+    # words ("ide" would match "ides", "ar" "ares"); short plurals are listed
+    if len(words[-1]) > 3:
+        pattern += "(?:e?s)?"
+    return pattern
+
+def _compile(keywords: dict):
+    groups, labels = [], {}
+    for i, (label, terms) in enumerate(keywords.items()):
+        # Longest first so a phrase wins over its own first word at the same position
+        ordered = sorted(set(terms), key=len, reverse=True)
+        groups.append(f"(?P<c{i}>{'|'.join(_term_pattern(t) for t in ordered)})")
+        labels[f"c{i}"] = label
+    # One boundary check around the whole alternation
+    pattern = rf"(?<!\w)(?:{'|'.join(groups)})(?!\w)"
+    return re.compile(pattern, re.IGNORECASE), labels
+
+_PATTERN, _GROUP_LABELS = _compile(KEYWORDS)
+_LABEL_INDEX = {label: i for i, label in enumerate(TOPIC_LABELS)}
+
+
+def score_labels(text: str) -> list[float]:
+    """Per-category scores in [0, 1), aligned with TOPIC_LABELS."""
+    hits = [0.0] * len(TOPIC_LABELS)
+    for match in _PATTERN.finditer(text or ""):
+        label = _GROUP_LABELS[match.lastgroup]
+        hits[_LABEL_INDEX[label]] += len(_SEPARATORS.split(match.group(match.lastgroup)))
+    # Saturating: one keyword ~0.63, two ~0.86, three ~0.95
+    return [1.0 - math.exp(-h) if h else 0.0 for h in hits]
+
+def score_labels_batch(texts: list[str]) -> list[list[float]]:
+    return [score_labels(t) for t in texts]
+
+def predict_labels(text: str, threshold: float = 0.5, top_k: int = 3) -> list[str]:
+    """Matching categories, best first; [] when no keyword matches."""
+    scores = score_labels(text)
+    ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    return [TOPIC_LABELS[i] for i in ranked[:top_k] if scores[i] >= threshold]
+
+def predict_labels_batch(texts: list[str], threshold: float = 0.5, top_k: int = 3) -> list[list[str]]:
+    return [predict_labels(t, threshold, top_k) for t in texts]
 
 def assign_label(text: str) -> str:
-    text = text.lower()
-    if "ai" in text or "machine learning" in text:
-        return "AI/ML"
-    elif "finance" in text or "payment" in text:
-        return "FinTech"
-    elif "health" in text or "medical" in text:
-        return "HealthTech"
-    elif "education" in text or "learning" in text:
-        return "EdTech"
-    else:
-        return "General"
+    labels = predict_labels(text, top_k=1)
+    return labels[0] if labels else DEFAULT_LABEL
@@ -0,0 +1,78 @@
+# ml/backends.py
+"""
+Inference backends for the classifiers in ml/infer.py.
+
+Every loader returns a runner: a callable that takes the tokenizer output
+(numpy arrays, `return_tensors="np"`) and returns a list of numpy logit
+arrays, one per model output ([logits] for a classifier,
+[sentiment_logits, topic_logits] for the multi-head model).
+
+    torch  - fp32 PyTorch (default)
+    int8   - PyTorch with dynamic int8 quantization of the Linear layers
+    onnx   - ONNX model exported by ml/export_onnx.py, run with onnxruntime
+"""
+import os
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification
+from ml.multihead import MultiHeadClassifier
+
+BACKENDS = ("torch", "int8", "onnx")
+ONNX_SUBDIR = "onnx"
+ONNX_FILE = "model.onnx"
+
+def onnx_path(model_dir: str) -> str:
+    return os.path.join(model_dir, ONNX_SUBDIR, ONNX_FILE)
+
+def load_torch_model(model_dir: str, multihead: bool = False):
+    # Inference only: frozen parameters are never written, so forked workers keep sharing them
+    if multihead:
+        return MultiHeadClassifier.from_pretrained(model_dir).eval().requires_grad_(False)
+    return AutoModelForSequenceClassification.from_pretrained(model_dir).eval().requires_grad_(False)
+
+def _torch_runner(model, device, multihead):
+    def run(enc):
+        inputs = {
+            "input_ids": torch.from_numpy(np.asarray(enc["input_ids"], dtype=np.int64)).to(device),
+            "attention_mask": torch.from_numpy(np.asarray(enc["attention_mask"], dtype=np.int64)).to(device),
+        }
+        with torch.no_grad():
+            out = model(**inputs)
+        if multihead:
+            return [out["sentiment_logits"].cpu().numpy(), out["topic_logits"].cpu().numpy()]
+        return [out.logits.cpu().numpy()]
+    run.model = model  # ml/infer.py embeds with its encoder
+    return run
+
+def _onnx_runner(model_dir):
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("The onnx backend needs `pip install onnxruntime`") from e
+
+    path = onnx_path(model_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; run `python -m ml.export_onnx` first")
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+    input_names = {i.name for i in session.get_inputs()}
+
+    def run(enc):
+        feeds = {k: np.asarray(enc[k], dtype=np.int64) for k in ("input_ids", "attention_mask") if k in input_names}
+        return session.run(None, feeds)
+    return run
+
+def load_runner(model_dir: str, backend: str = "torch", device: str = "cpu", multihead: bool = False):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {BACKENDS}")
+    if backend == "onnx":
+        return _onnx_runner(model_dir)
+
+    model = load_torch_model(model_dir, multihead)
+    if backend == "int8":
+        # Dynamic quantization is CPU-only
+        device = "cpu"
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return _torch_runner(model.to(device), device, multihead)
@@ -0,0 +1,140 @@
+# ml/data.py
+"""
+Shared data pipeline for the training scripts.
+
+  - CSV files are read row by row (csv module, no pandas), so a corpus
+    never has to fit in memory. The train/validation split is a stable
+    hash of the text instead of a shuffled split of the whole frame.
+  - Texts are tokenized once, without padding, into Arrow datasets saved
+    under CACHE_DIR and memory-mapped on later runs. The cache key covers
+    the source files' contents, the tokenizer (vocabulary and settings)
+    and max_length, so editing any of them re-tokenizes.
+  - Each example keeps a "length" column. With TRAINING_ARGS the Trainer
+    groups similar lengths into batches, and collator() pads each batch
+    only to its own longest example (rounded up to a multiple of 8).
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datasets import Dataset, DatasetDict, load_from_disk
+from transformers import DataCollatorWithPadding
+
+CACHE_DIR = os.getenv("TRAIN_CACHE_DIR", "ml/_data_cache")
+MAX_LENGTH = 256
+VAL_FRACTION = 0.2
+PIPELINE_VERSION = "1"  # bump when the cached columns change
+
+# Keyword arguments for TrainingArguments: length-bucketed batch sampling
+TRAINING_ARGS = {"group_by_length": True, "length_column_name": "length"}
+
+
+def iter_csv(path: str):
+    """Rows of a CSV file as dicts, one at a time."""
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+def in_validation(text: str, fraction: float = VAL_FRACTION) -> bool:
+    """Stable split: the same text always lands on the same side."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < fraction
+
+def file_digest(*paths: str) -> str:
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of everything that changes the token ids a tokenizer produces."""
+    h = hashlib.sha256(type(tokenizer).__name__.encode())
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        # Truncation/padding state is left behind by whichever call ran last
+        spec = json.loads(backend.to_str())
+        spec.pop("truncation", None)
+        spec.pop("padding", None)
+        h.update(json.dumps(spec, sort_keys=True).encode())
+    else:
+        h.update(repr(sorted(tokenizer.get_vocab().items())).encode())
+    h.update(repr(sorted((k, repr(v)) for k, v in tokenizer.init_kwargs.items())).encode())
+    return h.hexdigest()
+
+def collator(tokenizer):
+    """Pads each batch to its longest example, not to MAX_LENGTH."""
+    return DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8)
+
+
+def _split_rows(rows_fn, split: str):
+    for row in rows_fn():
+        if in_validation(row["text"]) == (split == "validation"):
+            yield row
+
+def _tokenize(batch, tokenizer, max_length):
+    enc = tokenizer(batch["text"], truncation=True, max_length=max_length)
+    enc["length"] = [len(ids) for ids in enc["input_ids"]]
+    return enc
+
+def _rows(rows_fn):
+    yield from rows_fn()
+
+def tokenize_rows(rows_fn, tokenizer, max_length: int = MAX_LENGTH) -> Dataset:
+    """
+    Tokenized in-memory dataset of rows_fn(), not cached on disk. For
+    small one-off sets such as an incremental training delta.
+    """
+    scratch = tempfile.mkdtemp(prefix="tokenize-")
+    try:
+        ds = Dataset.from_generator(_rows, gen_kwargs={"rows_fn": rows_fn}, cache_dir=scratch, keep_in_memory=True)
+        return ds.map(_tokenize, batched=True, remove_columns=["text"], keep_in_memory=True,
+                      fn_kwargs={"tokenizer": tokenizer, "max_length": max_length})
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def tokenized_splits(name: str, rows_fn, sources: list[str], tokenizer,
+                     max_length: int = MAX_LENGTH, cache_dir: str = CACHE_DIR) -> DatasetDict:
+    """
+    Train/validation datasets of tokenized rows, built on first use and
+    memory-mapped from cache_dir afterwards.
+
+    rows_fn() yields dicts with a "text" key plus label columns, usually
+    by streaming the files in `sources`, which are hashed into the key.
+    """
+    key = hashlib.sha256("|".join([
+        PIPELINE_VERSION, name, file_digest(*sources), tokenizer_fingerprint(tokenizer), str(max_length),
+    ]).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{name}-{key}")
+    if os.path.isdir(path):
+        print(f"✅ Using tokenized cache {path}")
+        return load_from_disk(path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=cache_dir, prefix=".build-")
+    try:
+        splits = {}
+        for split in ("train", "validation"):
+            if next(_split_rows(rows_fn, split), None) is None:
+                raise ValueError(f"No {split} rows in {', '.join(sources)}; the corpus is too small to split")
+            ds = Dataset.from_generator(
+                _split_rows, gen_kwargs={"rows_fn": rows_fn, "split": split}, cache_dir=scratch
+            )
+            splits[split] = ds.map(
+                _tokenize, batched=True, remove_columns=["text"],
+                fn_kwargs={"tokenizer": tokenizer, "max_length": max_length},
+                cache_file_name=os.path.join(scratch, f"{split}-tokenized.arrow"),
+            )
+        # Written aside and moved into place, so an interrupted build is never loaded
+        DatasetDict(splits).save_to_disk(os.path.join(scratch, "out"))
+        try:
+            os.replace(os.path.join(scratch, "out"), path)
+        except OSError:
+            if not os.path.isdir(path):  # otherwise a concurrent run finished first
+                raise
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    print(f"✅ Tokenized dataset cached at {path}")
+    return load_from_disk(path)
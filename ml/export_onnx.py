@@ -0,0 +1,68 @@
+# ml/export_onnx.py
+import argparse
+import inspect
+import os
+import torch
+from transformers import AutoTokenizer
+from ml.backends import load_torch_model, onnx_path
+from ml.multihead import is_multihead_dir
+
+MODEL_DIRS = ["ml/sentiment_model", "ml/topic_model", "ml/multihead_model"]
+
+class _LogitsOnly(torch.nn.Module):
+    """Unwrap HF / multi-head outputs into plain tensors for the ONNX graph."""
+
+    def __init__(self, model, multihead):
+        super().__init__()
+        self.model = model
+        self.multihead = multihead
+
+    def forward(self, input_ids, attention_mask):
+        out = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        if self.multihead:
+            return out["sentiment_logits"], out["topic_logits"]
+        return out.logits
+
+def export(model_dir: str, opset: int = 17) -> str:
+    multihead = is_multihead_dir(model_dir)
+    model = _LogitsOnly(load_torch_model(model_dir, multihead), multihead).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    sample = tokenizer(["An example startup idea", "short"], return_tensors="pt", padding=True)
+
+    out_path = onnx_path(model_dir)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    output_names = ["sentiment_logits", "topic_logits"] if multihead else ["logits"]
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+    }
+    dynamic_axes.update({name: {0: "batch"} for name in output_names})
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        out_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=output_names,
+        dynamic_axes=dynamic_axes,
+        opset_version=opset,
+        **extra,
+    )
+    return out_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Export trained classifiers to ONNX")
+    parser.add_argument("model_dirs", nargs="*", default=MODEL_DIRS)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    for model_dir in args.model_dirs:
+        if not os.path.isdir(model_dir):
+            print(f"⚠️ Skipping {model_dir} (not trained yet)")
+            continue
+        print(f"✅ Exported {export(model_dir, args.opset)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,451 @@
 # ml/infer.py
+"""
+Sentiment and topic inference for saved ideas.
+
+The models come from the registry (ml/registry.py): a ModelSet holds one
+version of each, loaded lazily. Every call takes the active set once and
+uses it throughout, so a call never mixes versions. reload() switches to
+newly activated versions without a restart: the new set is loaded and
+warmed beside the old one, then becomes active, and calls already running
+finish on the old set. A background thread checks the registry every
+RELOAD_SECONDS.
+
+Logits are memoized by text and model version, and predictions can report
+the version that produced them (with_version=True), so caches and stored
+results are invalidated exactly when a version changes.
+"""
+import logging
 import os
+import threading
+import time
 import torch
 import numpy as np
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer, AutoModel
+from ml import registry
 from ml.labels import TOPIC_LABELS
+from ml.batcher import MicroBatcher
+from ml.multihead import is_multihead_dir
+from ml.backends import load_runner
+from ml.memo import InferenceMemo, text_key
+from labeler import predict_labels, predict_labels_batch
+from modules.metrics import span, timed
+
+# Paths where the training scripts save the models; used for any model the
+# registry has no active version of
+SENTIMENT_DIR = registry.LEGACY_DIRS["sentiment"]
+TOPIC_DIR     = registry.LEGACY_DIRS["topics"]
+MULTIHEAD_DIR = registry.LEGACY_DIRS["multihead"]
+
+# "separate" (two models), "multihead" (one shared encoder) or
+# "auto" (multihead when ml/train_multihead.py has produced a model)
+MODEL_MODE = os.getenv("INFER_MODEL_MODE", "auto")
+
+# "torch" (fp32), "int8" (dynamically quantized torch) or "onnx" (see ml/backends.py)
+BACKEND = os.getenv("INFER_BACKEND", "torch")
+
+# Micro-batching: gather concurrent single-text calls into one forward pass
+MICROBATCH = os.getenv("INFER_MICROBATCH", "1") == "1"
+MAX_BATCH_SIZE = int(os.getenv("INFER_MAX_BATCH_SIZE", 32))
+MAX_WAIT_MS = float(os.getenv("INFER_MAX_WAIT_MS", 5))
+
+# Memoized logits: in-memory LRU size, plus an optional SQLite file to share them
+MEMO_SIZE = int(os.getenv("INFER_MEMO_SIZE", 10000))
+MEMO_DB = os.getenv("INFER_MEMO_DB", "")
+
+# Seconds between checks for newly activated model versions (0: never)
+RELOAD_SECONDS = float(os.getenv("INFER_RELOAD_SECONDS", 30))
+
+# Version reported for predictions made by the keyword rules
+FALLBACK_VERSION = "keywords"
 
-# Paths where the training scripts saved the models
-SENTIMENT_DIR = "ml/sentiment_model"
-TOPIC_DIR     = "ml/topic_model"
+SENTIMENT_MAPPING = {0: "negative", 1: "neutral", 2: "positive"}
 
 _device = "cuda" if torch.cuda.is_available() else "cpu"
 
-# Lazy singletons
-_tokenizer_sent = None
-_model_sent = None
-_tokenizer_topic = None
-_model_topic = None
+log = logging.getLogger(__name__)
+
+
+# ------------------------
+# Model sets
+# ------------------------
+class ModelSet:
+    """
+    One immutable choice of model versions: either a multihead model or
+    separate sentiment and topic models. Each loads on first use.
+    """
+
+    def __init__(self, refs: dict):
+        self.refs = refs   # model name -> registry.ModelRef
+        self.multihead = "multihead" in refs
+        self._models = {}  # model name -> (tokenizer, runner)
+        self._encoder = None
+        self._lock = threading.Lock()
+
+    def ref(self, kind: str) -> registry.ModelRef:
+        name = "multihead" if self.multihead else kind
+        if name not in self.refs:
+            raise FileNotFoundError(f"No {name} model in {registry.REGISTRY_DIR} or {registry.LEGACY_DIRS[name]}")
+        return self.refs[name]
+
+    def version(self, kind: str) -> str:
+        try:
+            return f"{self.ref(kind).key}:{BACKEND}"
+        except FileNotFoundError:
+            return "none"
+
+    def scoring_version(self) -> str:
+        return f"{self.version('sentiment')}|{self.version('topics')}"
+
+    def model(self, kind: str):
+        """(tokenizer, runner) for kind, loaded on first use."""
+        ref = self.ref(kind)
+        loaded = self._models.get(ref.name)
+        if loaded is None:
+            with self._lock:
+                loaded = self._models.get(ref.name)
+                if loaded is None:
+                    loaded = (AutoTokenizer.from_pretrained(ref.path),
+                              load_runner(ref.path, BACKEND, _device, multihead=self.multihead))
+                    self._models[ref.name] = loaded
+        return loaded
+
+    def encoder(self):
+        """(tokenizer, encoder) for embeddings: the topic (or shared multihead) encoder."""
+        if self._encoder is None:
+            ref = self.ref("topics")
+            # With the torch backend that is the loaded classifier's own encoder, not a second copy
+            shared = self.model("topics") if BACKEND == "torch" else None
+            with self._lock:
+                if self._encoder is None:
+                    if shared is not None:
+                        tokenizer, runner = shared
+                        self._encoder = (tokenizer, runner.model.encoder if self.multihead else runner.model.base_model)
+                    else:
+                        # int8 and onnx runners hold no fp32 torch encoder
+                        self._encoder = (AutoTokenizer.from_pretrained(ref.path),
+                                         AutoModel.from_pretrained(ref.path).to(_device).eval().requires_grad_(False))
+        return self._encoder
+
+    def adopt(self, other: "ModelSet"):
+        """Share the already-loaded models whose version did not change."""
+        for name, loaded in other._models.items():
+            if self.refs.get(name) == other.refs.get(name):
+                self._models[name] = loaded
+        if other._encoder is not None and self.multihead == other.multihead:
+            name = "multihead" if self.multihead else "topics"
+            if self.refs.get(name) == other.refs.get(name):
+                self._encoder = other._encoder
+
+    def in_use(self) -> bool:
+        return bool(self._models) or self._encoder is not None
+
+    def load(self, encoder: bool = False):
+        for kind in ("sentiment", "topics"):
+            self.model(kind)
+        if encoder:
+            self.encoder()
+
+    def warm(self):
+        """One tiny forward pass per model, so the first real call is not the slow one."""
+        self.forward("sentiment", ["warm up"])
+        if not self.multihead:
+            self.forward("topics", ["warm up"])
+        if self._encoder is not None:
+            self.embed(["warm up"])
+
+    def forward(self, kind: str, texts: list[str]) -> dict:
+        """Logits per kind; both kinds from one pass in multihead mode."""
+        tokenizer, runner = self.model(kind)
+        with span("tokenize"):
+            enc = tokenizer(texts, return_tensors="np", truncation=True, padding=True, max_length=256)
+        with span("forward"):
+            out = runner(enc)
+        if self.multihead:
+            return {"sentiment": list(out[0]), "topics": list(out[1])}
+        return {kind: list(out[0])}
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        tokenizer, encoder = self.encoder()
+        if not texts:
+            return np.empty((0, encoder.config.hidden_size if hasattr(encoder.config, "hidden_size") else encoder.config.dim), dtype=np.float32)
+        out = []
+        for i in range(0, len(texts), MAX_BATCH_SIZE):
+            enc = tokenizer(texts[i:i + MAX_BATCH_SIZE], return_tensors="pt",
+                            truncation=True, padding=True, max_length=256).to(_device)
+            with torch.no_grad():
+                hidden = encoder(input_ids=enc["input_ids"], attention_mask=enc["attention_mask"]).last_hidden_state
+            mask = enc["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            out.append(torch.nn.functional.normalize(pooled, dim=-1).cpu().numpy())
+        return np.concatenate(out).astype(np.float32)
+
+
+def _resolve_refs() -> dict:
+    multihead = registry.resolve("multihead")
+    if MODEL_MODE == "auto":
+        use_multihead = multihead is not None and is_multihead_dir(multihead.path)
+    else:
+        use_multihead = MODEL_MODE == "multihead"
+    if use_multihead:
+        return {"multihead": multihead} if multihead else {}
+    return {name: ref for name in ("sentiment", "topics") if (ref := registry.resolve(name))}
+
+_active = None
+_reload_lock = threading.Lock()
+_watcher = None
+
+def reload() -> bool:
+    """
+    Make the registry's active versions current, if they changed. When the
+    current set is in use, the new one is loaded and warmed before the
+    swap, so no call waits for a cold load. Returns whether it switched.
+    """
+    global _active
+    with _reload_lock:
+        current = _active
+        refs = _resolve_refs()
+        if current is not None and refs == current.refs:
+            return False
+        fresh = ModelSet(refs)
+        if current is not None and current.in_use():
+            fresh.adopt(current)
+            fresh.load(encoder=current._encoder is not None)
+            fresh.warm()
+        _active = fresh
+    if current is not None:
+        log.info("Switched models: %s -> %s", current.scoring_version(), fresh.scoring_version())
+    return True
+
+def _watch():
+    while True:
+        time.sleep(RELOAD_SECONDS)
+        try:
+            reload()
+        except Exception:
+            # e.g. a legacy directory caught mid-save; keep the current set and retry
+            log.warning("Model reload failed; keeping the current models", exc_info=True)
+
+def _after_fork():
+    # The watcher thread stays behind in the parent, possibly holding the lock
+    global _reload_lock, _watcher
+    _reload_lock = threading.Lock()
+    _watcher = None
+
+os.register_at_fork(after_in_child=_after_fork)
+
+def active_models() -> ModelSet:
+    """The current ModelSet; take it once per call and use it throughout."""
+    global _watcher
+    if _active is None:
+        reload()
+    if RELOAD_SECONDS > 0 and _watcher is None:
+        with _reload_lock:
+            if _watcher is None:
+                _watcher = threading.Thread(target=_watch, name="model-reload", daemon=True)
+                _watcher.start()
+    return _active
+
+def models_configured() -> bool:
+    """Whether there are models to load at all; without them the keyword rules are all there is."""
+    models = active_models()
+    return models.multihead or {"sentiment", "topics"} <= models.refs.keys()
+
+def models_loaded() -> bool:
+    return _active is not None and _active.in_use()
 
-def _load_sentiment():
-    global _tokenizer_sent, _model_sent
-    if _model_sent is None:
-        _tokenizer_sent = AutoTokenizer.from_pretrained(SENTIMENT_DIR)
-        _model_sent = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_DIR).to(_device).eval()
+def load_models(encoder: bool = False):
+    """Load the scoring models now; raises if they are missing (no keyword fallback)."""
+    active_models().load(encoder)
 
-def _load_topics():
-    global _tokenizer_topic, _model_topic
-    if _model_topic is None:
-        _tokenizer_topic = AutoTokenizer.from_pretrained(TOPIC_DIR)
-        _model_topic = AutoModelForSequenceClassification.from_pretrained(TOPIC_DIR).to(_device).eval()
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
 
+# ------------------------
+# Embeddings
+# ------------------------
+def embed_batch(texts: list[str], with_version: bool = False):
+    """
+    Unit-length mean-pooled encoder states, shape (len(texts), hidden);
+    with_version=True returns (vectors, embedding version).
+    """
+    models = active_models()
+    vectors = models.embed(texts)
+    return (vectors, models.ref("topics").key) if with_version else vectors
+
+def embedding_version() -> str:
+    return active_models().ref("topics").key
+
+# ------------------------
+# Memoization of logits by normalized text + model version
+# ------------------------
+_memo = InferenceMemo(MEMO_SIZE, MEMO_DB or None)
+
+def scoring_version() -> str:
+    """Identifies the models behind predict_all*(); changes when either is retrained."""
+    return active_models().scoring_version()
+
+def _key(models: ModelSet, kind: str, text: str) -> str:
+    return text_key(kind, models.version(kind), text)
+
+def _memo_enabled() -> bool:
+    return _memo.max_entries > 0 or bool(_memo.sqlite_path)
+
+def _lookup(models: ModelSet, kind: str, texts: list[str]) -> list:
+    if not _memo_enabled():
+        return [None] * len(texts)
+    return [_memo.get(_key(models, kind, t)) for t in texts]
+
+def _forward(models: ModelSet, kind: str, texts: list[str]) -> dict:
+    """Run the model on texts (no lookup) and memoize everything it produced."""
+    fresh = models.forward(kind, texts)
+    if _memo_enabled():
+        for k, logits in fresh.items():
+            _memo.put_many((_key(models, k, t), l) for t, l in zip(texts, logits))
+    return fresh
+
+def _compute(models: ModelSet, kind: str, texts: list[str]) -> list[np.ndarray]:
+    return _forward(models, kind, texts)[kind]
+
+def _logits(models: ModelSet, kind: str, texts: list[str]) -> list[np.ndarray]:
+    out = _lookup(models, kind, texts)
+    missing = [i for i, v in enumerate(out) if v is None]
+    for start in range(0, len(missing), MAX_BATCH_SIZE):
+        chunk = missing[start:start + MAX_BATCH_SIZE]
+        for i, logits in zip(chunk, _compute(models, kind, [texts[i] for i in chunk])):
+            out[i] = logits
+    return out
+
+def _logits_all(models: ModelSet, texts: list[str]) -> tuple[list[np.ndarray], list[np.ndarray]]:
+    """Sentiment and topic logits; in multihead mode one forward pass serves both."""
+    if not models.multihead:
+        return _logits(models, "sentiment", texts), _logits(models, "topics", texts)
+    sent = _lookup(models, "sentiment", texts)
+    topics = _lookup(models, "topics", texts)
+    missing = [i for i in range(len(texts)) if sent[i] is None or topics[i] is None]
+    for start in range(0, len(missing), MAX_BATCH_SIZE):
+        chunk = missing[start:start + MAX_BATCH_SIZE]
+        fresh = _forward(models, "sentiment", [texts[i] for i in chunk])
+        for j, i in enumerate(chunk):
+            sent[i], topics[i] = fresh["sentiment"][j], fresh["topics"][j]
+    return sent, topics
+
+def _single(models: ModelSet, kind: str, text: str):
+    """Logits of one text; kind "all" gives the (sentiment, topics) pair."""
+    if kind == "all":
+        hit = tuple(_lookup(models, k, [text])[0] for k in ("sentiment", "topics"))
+        if None not in hit:
+            return hit
+    else:
+        hit = _lookup(models, kind, [text])[0]
+        if hit is not None:
+            return hit
+    if MICROBATCH:
+        return _batchers[kind]((models, text))
+    return _compute_items(kind, [(models, text)])[0]
+
+def _compute_items(kind: str, items: list) -> list:
+    """Batch function for the micro-batchers: each (ModelSet, text) runs on its own set."""
+    out = [None] * len(items)
+    groups = {}
+    for i, (models, _) in enumerate(items):
+        groups.setdefault(id(models), (models, []))[1].append(i)
+    for models, idx in groups.values():
+        texts = [items[i][1] for i in idx]
+        results = zip(*_logits_all(models, texts)) if kind == "all" else _compute(models, kind, texts)
+        for i, logits in zip(idx, results):
+            out[i] = logits
+    return out
+
+_batchers = {
+    kind: MicroBatcher(lambda items, kind=kind: _compute_items(kind, items), MAX_BATCH_SIZE, MAX_WAIT_MS, name=f"{kind}-batcher")
+    for kind in ("sentiment", "topics", "all")
+}
+
+def memo_stats() -> dict:
+    """Hit ratio and size of the inference memo."""
+    return _memo.stats()
+
+# ------------------------
+# Decoding
+# ------------------------
+def _sentiment_from_logits(logits: np.ndarray) -> str:
+    return SENTIMENT_MAPPING.get(int(np.argmax(logits)), "neutral")
+
+def _topics_from_logits(logits: np.ndarray, threshold: float) -> list[str]:
+    probs = _sigmoid(logits)
+    on = np.where(probs >= threshold)[0].tolist()
+    # fallback: if none cross threshold, pick top-1
+    if not on:
+        on = [int(np.argmax(probs))]
+    return [TOPIC_LABELS[i] for i in on]
+
+# ------------------------
+# Public API
+# ------------------------
+@timed()
+def predict_sentiment_batch(texts: list[str]) -> list[str]:
+    if not texts:
+        return []
+    try:
+        return [_sentiment_from_logits(l) for l in _logits(active_models(), "sentiment", texts)]
+    except Exception:
+        return ["neutral"] * len(texts)
+
+@timed()
+def predict_topics_batch(texts: list[str], threshold: float = 0.5) -> list[list[str]]:
+    if not texts:
+        return []
+    try:
+        return [_topics_from_logits(l, threshold) for l in _logits(active_models(), "topics", texts)]
+    except Exception:
+        # Keyword rules when the topic model is unavailable
+        return predict_labels_batch(texts)
+
+@timed()
 def predict_sentiment(text: str) -> str:
     try:
-        _load_sentiment()
-        enc = _tokenizer_sent(text, return_tensors="pt", truncation=True, padding=True, max_length=256).to(_device)
-        with torch.no_grad():
-            logits = _model_sent(**enc).logits
-        pred = int(torch.argmax(logits, dim=-1).cpu().numpy()[0])
-        mapping = {0: "negative", 1: "neutral", 2: "positive"}
-        return mapping.get(pred, "neutral")
+        return _sentiment_from_logits(_single(active_models(), "sentiment", text))
     except Exception:
         return "neutral"
 
+@timed()
 def predict_topics(text: str, threshold: float = 0.5) -> list[str]:
     try:
-        _load_topics()
-        enc = _tokenizer_topic(text, return_tensors="pt", truncation=True, padding=True, max_length=256).to(_device)
-        with torch.no_grad():
-            logits = _model_topic(**enc).logits
-        probs = torch.sigmoid(logits).cpu().numpy()[0]
-        on = np.where(probs >= threshold)[0].tolist()
-        # fallback: if none cross threshold, pick top-1
-        if not on:
-            on = [int(np.argmax(probs))]
-        return [TOPIC_LABELS[i] for i in on]
+        return _topics_from_logits(_single(active_models(), "topics", text), threshold)
     except Exception:
-        return []
+        return predict_labels(text)
+
+@timed()
+def predict_all_batch(texts: list[str], threshold: float = 0.5, with_version: bool = False,
+                      fallback: bool = True):
+    """
+    (sentiment, topics) per text; a single forward pass in multihead mode.
+    with_version=True returns (predictions, version), the version being
+    scoring_version() of the models used, or FALLBACK_VERSION.
+    fallback=False raises instead of answering with the keyword rules.
+    """
+    if not texts:
+        return ([], scoring_version()) if with_version else []
+    try:
+        models = active_models()
+        sent, topics = _logits_all(models, texts)
+        predicted = [(_sentiment_from_logits(s), _topics_from_logits(t, threshold)) for s, t in zip(sent, topics)]
+        version = models.scoring_version()
+    except Exception:
+        if not fallback:
+            raise
+        predicted = [("neutral", labels) for labels in predict_labels_batch(texts)]
+        version = FALLBACK_VERSION
+    return (predicted, version) if with_version else predicted
+
+@timed()
+def predict_all(text: str, threshold: float = 0.5, with_version: bool = False):
+    """(sentiment, topics), plus the version as in predict_all_batch()."""
+    try:
+        models = active_models()
+        sent, topics = _single(models, "all", text)
+        predicted = (_sentiment_from_logits(sent), _topics_from_logits(topics, threshold))
+        version = models.scoring_version()
+    except Exception:
+        predicted, version = ("neutral", predict_labels(text)), FALLBACK_VERSION
+    return (predicted, version) if with_version else predicted
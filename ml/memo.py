@@ -0,0 +1,110 @@
+# ml/memo.py
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def text_key(kind: str, model_version: str, text: str) -> str:
+    raw = f"{kind}\x00{model_version}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class InferenceMemo:
+    """
+    Bounded in-memory LRU of model logits keyed by text_key(), optionally
+    backed by a SQLite table so results survive restarts and are shared
+    between worker processes.
+    """
+
+    def __init__(self, max_entries: int = 10000, sqlite_path: str = None):
+        self.max_entries = max_entries
+        self.sqlite_path = sqlite_path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # SQLite connections must not cross fork (gunicorn preload, modules/preload.py)
+        os.register_at_fork(after_in_child=self._forget_connections)
+        if sqlite_path:
+            conn = self._conn()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS inference_memo (
+                    key TEXT PRIMARY KEY,
+                    logits BLOB NOT NULL
+                )
+            """)
+            conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.sqlite_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def _remember(self, key, value):
+        # caller holds self._lock
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.sqlite_path:
+            row = self._conn().execute("SELECT logits FROM inference_memo WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value = np.frombuffer(row[0], dtype=np.float32)
+                with self._lock:
+                    self._remember(key, value)
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put_many(self, items):
+        items = [(k, np.asarray(v, dtype=np.float32)) for k, v in items]
+        with self._lock:
+            for key, value in items:
+                self._remember(key, value)
+        if self.sqlite_path and items:
+            conn = self._conn()
+            conn.executemany(
+                "INSERT OR REPLACE INTO inference_memo (key, logits) VALUES (?, ?)",
+                [(k, v.tobytes()) for k, v in items],
+            )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "size": len(self._data),
+                "capacity": self.max_entries,
+            }
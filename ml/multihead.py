@@ -0,0 +1,83 @@
+# ml/multihead.py
+import json
+import os
+import torch
+from torch import nn
+from transformers import AutoModel
+from ml.labels import TOPIC_LABELS
+
+NUM_SENTIMENT = 3
+HEADS_FILE = "heads.pt"
+HEADS_CONFIG = "heads.json"
+
+
+class MultiHeadClassifier(nn.Module):
+    """
+    One shared encoder with two classification heads:
+    3-way sentiment (softmax) and multi-label topics (sigmoid).
+
+    Labels are optional per example: sentiment_labels uses -100 for
+    "no sentiment label", topic_mask marks rows that carry topic labels.
+    """
+
+    def __init__(self, encoder, num_sentiment=NUM_SENTIMENT, num_topics=len(TOPIC_LABELS), dropout=0.1):
+        super().__init__()
+        self.encoder = encoder
+        hidden = encoder.config.hidden_size if hasattr(encoder.config, "hidden_size") else encoder.config.dim
+        self.dropout = nn.Dropout(dropout)
+        self.sentiment_head = nn.Linear(hidden, num_sentiment)
+        self.topic_head = nn.Linear(hidden, num_topics)
+        self.num_sentiment = num_sentiment
+        self.num_topics = num_topics
+
+    @classmethod
+    def from_encoder(cls, model_name):
+        return cls(AutoModel.from_pretrained(model_name))
+
+    def forward(self, input_ids=None, attention_mask=None,
+                sentiment_labels=None, topic_labels=None, topic_mask=None):
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        pooled = self.dropout(hidden[:, 0])  # [CLS] token, as in DistilBertForSequenceClassification
+        sentiment_logits = self.sentiment_head(pooled)
+        topic_logits = self.topic_head(pooled)
+
+        out = {"sentiment_logits": sentiment_logits, "topic_logits": topic_logits}
+        if sentiment_labels is not None or topic_labels is not None:
+            loss = sentiment_logits.new_zeros(())
+            if sentiment_labels is not None and (sentiment_labels != -100).any():
+                loss = loss + nn.functional.cross_entropy(sentiment_logits, sentiment_labels, ignore_index=-100)
+            if topic_labels is not None:
+                mask = topic_mask.float() if topic_mask is not None else torch.ones_like(topic_logits[:, 0])
+                if mask.sum() > 0:
+                    per_row = nn.functional.binary_cross_entropy_with_logits(
+                        topic_logits, topic_labels.float(), reduction="none"
+                    ).mean(dim=-1)
+                    loss = loss + (per_row * mask).sum() / mask.sum()
+            out["loss"] = loss
+        return out
+
+    def save_pretrained(self, save_dir):
+        os.makedirs(save_dir, exist_ok=True)
+        self.encoder.save_pretrained(save_dir)
+        torch.save({
+            "sentiment_head": self.sentiment_head.state_dict(),
+            "topic_head": self.topic_head.state_dict(),
+        }, os.path.join(save_dir, HEADS_FILE))
+        with open(os.path.join(save_dir, HEADS_CONFIG), "w") as f:
+            json.dump({"num_sentiment": self.num_sentiment,
+                       "num_topics": self.num_topics,
+                       "topic_labels": TOPIC_LABELS}, f, indent=2)
+
+    @classmethod
+    def from_pretrained(cls, save_dir):
+        with open(os.path.join(save_dir, HEADS_CONFIG)) as f:
+            cfg = json.load(f)
+        model = cls(AutoModel.from_pretrained(save_dir), cfg["num_sentiment"], cfg["num_topics"])
+        heads = torch.load(os.path.join(save_dir, HEADS_FILE), map_location="cpu")
+        model.sentiment_head.load_state_dict(heads["sentiment_head"])
+        model.topic_head.load_state_dict(heads["topic_head"])
+        return model
+
+
+def is_multihead_dir(path) -> bool:
+    return os.path.exists(os.path.join(path, HEADS_FILE))
@@ -0,0 +1,101 @@
+# ml/parity_check.py
+"""
+Compare inference backends (torch fp32 / int8 / onnx) on the labelled CSVs.
+
+Reports, per backend and model: accuracy (sentiment) or micro-F1 (topics),
+the delta against fp32 torch, prediction agreement with fp32, the largest
+logit difference, and single-text p50/p99 latency.
+
+    python -m ml.parity_check [--backends torch int8 onnx] [--repeat 20] [--json out.json]
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score
+from transformers import AutoTokenizer
+from ml.backends import BACKENDS, load_runner
+from ml.infer import SENTIMENT_DIR, TOPIC_DIR, SENTIMENT_MAPPING
+from ml.train_topics import encode_labels
+
+def _latency(runner, tokenizer, texts, repeat):
+    timings = []
+    for _ in range(repeat):
+        for text in texts:
+            enc = tokenizer([text], return_tensors="np", truncation=True, padding=True, max_length=256)
+            t0 = time.perf_counter()
+            runner(enc)
+            timings.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+def _logits(runner, tokenizer, texts):
+    enc = tokenizer(texts, return_tensors="np", truncation=True, padding=True, max_length=256)
+    return runner(enc)[0]
+
+def check_model(kind, model_dir, texts, y_true, backends, repeat, threshold=0.5):
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    rows, reference = [], None
+    for backend in backends:
+        try:
+            runner = load_runner(model_dir, backend)
+        except Exception as e:
+            rows.append({"model": kind, "backend": backend, "error": str(e)})
+            continue
+
+        logits = _logits(runner, tokenizer, texts)
+        if kind == "sentiment":
+            preds = np.argmax(logits, axis=-1)
+            score = accuracy_score(y_true, preds)
+        else:
+            preds = (1.0 / (1.0 + np.exp(-logits)) >= threshold).astype(int)
+            score = f1_score(y_true, preds, average="micro", zero_division=0)
+
+        if reference is None:
+            reference = (logits, preds, score)
+        same = preds == reference[1]
+        agreement = same.mean() if same.ndim == 1 else same.all(axis=-1).mean()
+        p50, p99 = _latency(runner, tokenizer, texts, repeat)
+        rows.append({
+            "model": kind,
+            "backend": backend,
+            "score": float(score),
+            "score_delta": float(score - reference[2]),
+            "agreement": float(agreement),
+            "max_logit_diff": float(np.max(np.abs(logits - reference[0]))),
+            "p50_ms": p50,
+            "p99_ms": p99,
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--sentiment-dir", default=SENTIMENT_DIR)
+    parser.add_argument("--topic-dir", default=TOPIC_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    label2id = {v: k for k, v in SENTIMENT_MAPPING.items()}
+    sent = pd.read_csv("data/ideas.csv")
+    topics = pd.read_csv("data/ideas_topics.csv")
+
+    results = check_model("sentiment", args.sentiment_dir, sent["text"].tolist(),
+                          sent["sentiment"].map(label2id).to_numpy(), args.backends, args.repeat)
+    results += check_model("topics", args.topic_dir, topics["text"].tolist(),
+                           np.array(topics["topics"].apply(encode_labels).tolist()), args.backends, args.repeat)
+
+    print(f"{'model':<10} {'backend':<7} {'score':>6} {'delta':>7} {'agree':>6} {'max|Δ|':>8} {'p50 ms':>7} {'p99 ms':>7}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['model']:<10} {r['backend']:<7} ⚠️ {r['error']}")
+            continue
+        print(f"{r['model']:<10} {r['backend']:<7} {r['score']:6.3f} {r['score_delta']:+7.3f} {r['agreement']:6.2f} "
+              f"{r['max_logit_diff']:8.4f} {r['p50_ms']:7.2f} {r['p99_ms']:7.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# ml/registry.py
+"""
+Versioned model registry for ml/infer.py.
+
+    ml/registry/
+      manifest.json                      which version of each model is active
+      sentiment/20261017-081200-3fa2c1/  one immutable directory per version
+      topics/...
+      multihead/...
+
+publish() copies a trained model directory (config, weights, tokenizer and
+an optional onnx/ export) in as a new version and, by default, activates
+it. activate() points a model at any published version, e.g. to roll back.
+Version directories and the manifest are written aside and moved into
+place, so a reader never sees a partial model or manifest. Running
+workers pick up a newly active version without a restart (ml.infer.reload).
+
+A model with no registry entry falls back to the directory its training
+script writes (ml/sentiment_model, ...), versioned by its file mtimes.
+Run from the repo root:
+
+    python -m ml.registry publish sentiment ml/sentiment_model
+    python -m ml.registry list
+    python -m ml.registry activate sentiment 20261017-081200-3fa2c1
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "ml/registry")
+MANIFEST = "manifest.json"
+
+# Where the training scripts save each model
+LEGACY_DIRS = {
+    "sentiment": "ml/sentiment_model",
+    "topics": "ml/topic_model",
+    "multihead": "ml/multihead_model",
+}
+
+
+class ModelRef(NamedTuple):
+    name: str
+    version: str
+    path: str
+    legacy: bool = False
+
+    @property
+    def key(self) -> str:
+        """Unique across models; a legacy version already contains its path."""
+        return self.version if self.legacy else f"{self.name}/{self.version}"
+
+
+def _registry_dir(registry_dir: str = None) -> str:
+    return registry_dir or REGISTRY_DIR
+
+def read_manifest(registry_dir: str = None) -> dict:
+    try:
+        with open(os.path.join(_registry_dir(registry_dir), MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"models": {}}
+
+def _write_manifest(manifest: dict, registry_dir: str):
+    tmp = os.path.join(registry_dir, f".{MANIFEST}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(registry_dir, MANIFEST))
+
+@contextmanager
+def _locked(registry_dir: str):
+    """Serialise manifest read-modify-write across processes."""
+    os.makedirs(registry_dir, exist_ok=True)
+    with open(os.path.join(registry_dir, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def dir_digest(path: str) -> str:
+    """Content hash of a model directory (file names and bytes)."""
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            h.update(os.path.relpath(full, path).encode())
+            with open(full, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()
+
+def legacy_version(path: str) -> str:
+    try:
+        stamp = max(e.stat().st_mtime_ns for e in os.scandir(path) if e.is_file())
+    except (OSError, ValueError):
+        stamp = 0
+    return f"{path}@{stamp}"
+
+
+# ------------------------
+# Lookup
+# ------------------------
+def resolve(name: str, registry_dir: str = None) -> ModelRef | None:
+    """The active version of a model, or None if there is none at all."""
+    registry_dir = _registry_dir(registry_dir)
+    version = read_manifest(registry_dir)["models"].get(name, {}).get("active")
+    if version:
+        return ModelRef(name, version, os.path.join(registry_dir, name, version))
+    legacy = LEGACY_DIRS.get(name)
+    if legacy and os.path.isdir(legacy):
+        return ModelRef(name, legacy_version(legacy), legacy, legacy=True)
+    return None
+
+
+# ------------------------
+# Publishing
+# ------------------------
+def publish(name: str, src: str, version: str = None, activate: bool = True,
+            note: str = "", registry_dir: str = None) -> str:
+    """Copy the model in `src` into the registry as a new version; returns the version."""
+    if name not in LEGACY_DIRS:
+        raise ValueError(f"Unknown model {name!r}; expected one of {', '.join(LEGACY_DIRS)}")
+    if not os.path.isfile(os.path.join(src, "config.json")):
+        raise FileNotFoundError(f"{src} is not a saved model (no config.json)")
+    registry_dir = _registry_dir(registry_dir)
+    digest = dir_digest(src)
+    version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{digest[:6]}"
+    target = os.path.join(registry_dir, name, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"{name} version {version} is already published")
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=os.path.dirname(target), prefix=".publish-")
+    try:
+        shutil.copytree(src, os.path.join(scratch, version))
+        os.replace(os.path.join(scratch, version), target)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    with _locked(registry_dir):
+        manifest = read_manifest(registry_dir)
+        entry = manifest["models"].setdefault(name, {"active": None, "versions": {}})
+        entry["versions"][version] = {
+            "source": src, "sha256": digest, "note": note,
+            "published_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if activate:
+            entry["active"] = version
+        _write_manifest(manifest, registry_dir)
+    return version
+
+def activate(name: str, version: str, registry_dir: str = None):
+    registry_dir = _registry_dir(registry_dir)
+    with _locked(registry_dir):
+        manifest = read_manifest(registry_dir)
+        entry = manifest["models"].get(name)
+        if not entry or version not in entry["versions"]:
+            raise KeyError(f"{name} version {version} is not published")
+        entry["active"] = version
+        _write_manifest(manifest, registry_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish and activate model versions")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("publish", help="copy a trained model in as a new version")
+    p.add_argument("name", choices=list(LEGACY_DIRS))
+    p.add_argument("src", nargs="?", help="model directory (default: where its training script saves it)")
+    p.add_argument("--version")
+    p.add_argument("--note", default="")
+    p.add_argument("--no-activate", action="store_true")
+    a = sub.add_parser("activate", help="make a published version the active one")
+    a.add_argument("name", choices=list(LEGACY_DIRS))
+    a.add_argument("version")
+    sub.add_parser("list", help="show published versions")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        version = publish(args.name, args.src or LEGACY_DIRS[args.name], args.version,
+                          not args.no_activate, args.note, args.registry)
+        print(f"✅ Published {args.name} {version}" + ("" if args.no_activate else " (active)"))
+    elif args.command == "activate":
+        activate(args.name, args.version, args.registry)
+        print(f"✅ {args.name} {args.version} is now active")
+    else:
+        for name, entry in sorted(read_manifest(args.registry)["models"].items()):
+            for version, info in sorted(entry["versions"].items()):
+                mark = "*" if version == entry["active"] else " "
+                print(f"{mark} {name:<10} {version:<26} {info['published_at']}  {info.get('note', '')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# ml/similarity.py
+import threading
+import numpy as np
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorSet:
+    """
+    Growable matrix of unit vectors with their ids. Appends amortize by
+    doubling capacity; deletes swap the last row into the hole, so both
+    are O(dim) and the live rows stay contiguous for one matmul.
+    """
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.dim = dim
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._vecs = np.empty((capacity, dim), dtype=np.float32)
+        self._pos = {}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def _grow(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        ids = np.empty(capacity, dtype=np.int64)
+        vecs = np.empty((capacity, self.dim), dtype=np.float32)
+        ids[:self.size] = self._ids[:self.size]
+        vecs[:self.size] = self._vecs[:self.size]
+        self._ids, self._vecs = ids, vecs
+
+    def upsert(self, ids, vectors: np.ndarray):
+        vectors = normalize(np.atleast_2d(vectors))
+        for item_id, vec in zip(ids, vectors):
+            item_id = int(item_id)
+            row = self._pos.get(item_id)
+            if row is None:
+                self._grow(self.size + 1)
+                row = self.size
+                self._ids[row] = item_id
+                self._pos[item_id] = row
+                self.size += 1
+            self._vecs[row] = vec
+
+    def remove(self, item_id: int):
+        row = self._pos.pop(int(item_id), None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            moved = int(self._ids[last])
+            self._ids[row] = moved
+            self._vecs[row] = self._vecs[last]
+            self._pos[moved] = row
+        self.size -= 1
+
+    def search(self, query: np.ndarray, k: int = 5, exclude=None):
+        """Top-k (id, cosine) pairs, best first."""
+        if self.size == 0:
+            return []
+        q = normalize(query).reshape(-1)
+        scores = self._vecs[:self.size] @ q
+        if exclude is not None and int(exclude) in self._pos:
+            scores[self._pos[int(exclude)]] = -np.inf
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self._ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+class SimilarityIndex:
+    """Per-user VectorSets, so a query only scans that user's ideas."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def user(self, user_id) -> VectorSet:
+        with self._lock:
+            vs = self._users.get(user_id)
+            if vs is None:
+                vs = self._users[user_id] = VectorSet(self.dim)
+            return vs
+
+    def has_user(self, user_id) -> bool:
+        return user_id in self._users
+
+    def upsert(self, user_id, ids, vectors):
+        vs = self.user(user_id)
+        with vs.lock:
+            vs.upsert(ids, vectors)
+
+    def remove(self, user_id, item_id):
+        vs = self._users.get(user_id)
+        if vs is not None:
+            with vs.lock:
+                vs.remove(item_id)
+
+    def search(self, user_id, query, k: int = 5, exclude=None):
+        vs = self._users.get(user_id)
+        if vs is None:
+            return []
+        with vs.lock:
+            return vs.search(query, k, exclude)
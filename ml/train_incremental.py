@@ -0,0 +1,247 @@
+# ml/train_incremental.py
+"""
+Incremental fine-tuning from production saved ideas.
+
+Instead of retraining from distilbert-base-uncased on data/*.csv, this
+warm-starts from the active sentiment or topics model (ml/registry.py,
+else ml/sentiment_model or ml/topic_model) and publishes the result to
+the registry as a new active version, which running workers pick up
+without a restart. It trains on the saved_ideas rows added or changed since the last run, the
+"delta", plus a replay sample of rows the model has already seen, so the
+model does not drift towards the newest data.
+
+Every insert, every edit of an idea's text and every sentiment/label a
+user sets by hand gives the row a new `revision` (triggers, migration 6
+in init_db.py). The highest revision trained on is the watermark. It is
+saved in training_state.json inside the model directory, so the
+watermark always travels with the checkpoint it describes (and rolls
+back with it). The watermark stops short of any row still pending, so it
+is picked up once enriched. Only labels a user gave on the edit form
+(model_version "user") are trained on: everything else is the output of
+the keyword rules or of an earlier model, which the model would only
+learn back.
+
+Replay draws from the older saved ideas and the seed CSV, by reservoir
+sampling, sized at --replay-ratio times the delta. Run from the repo root:
+
+    python -m ml.train_incremental --task sentiment
+    python -m ml.train_incremental --task all --replay-ratio 0.5 --epochs 2
+    python -m ml.train_incremental --task topics --dry-run
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer, TrainingArguments
+from ml.data import in_validation, tokenize_rows, collator, TRAINING_ARGS
+from ml import registry, train_sentiment, train_topics
+from modules.db import DATABASE
+from modules.enrichment import USER_VERSION
+
+STATE_FILE = "training_state.json"
+REPLAY_RATIO = float(os.getenv("INCREMENTAL_REPLAY_RATIO", 1.0))
+MAX_DELTA = int(os.getenv("INCREMENTAL_MAX_ROWS", 20000))  # later rows wait for the next run
+MIN_DELTA = int(os.getenv("INCREMENTAL_MIN_ROWS", 1))
+
+
+# ------------------------
+# Tasks
+# ------------------------
+def sentiment_example(text: str, sentiment: str, label: str):
+    if sentiment in train_sentiment.label2id:
+        return {"text": text, "label": train_sentiment.label2id[sentiment]}
+    return None
+
+def topics_example(text: str, sentiment: str, label: str):
+    # saved_ideas.label is "Topic, Topic" (see modules/enrichment.py)
+    topics = [t.strip() for t in (label or "").split(",") if t.strip() in train_topics.label2id]
+    if topics:
+        return {"text": text, "labels": train_topics.encode_labels("|".join(topics))}
+    return None  # e.g. the "General" fallback: nothing to learn from
+
+TASKS = {
+    "sentiment": {
+        "base_model": train_sentiment.MODEL_NAME,
+        "model_kwargs": {"num_labels": 3, "id2label": train_sentiment.id2label,
+                         "label2id": train_sentiment.label2id},
+        "example": sentiment_example,
+        "csv_rows": train_sentiment.iter_rows,
+        "trainer": Trainer,
+    },
+    "topics": {
+        "base_model": train_topics.MODEL_NAME,
+        "model_kwargs": {"num_labels": len(train_topics.label2id), "problem_type": "multi_label_classification",
+                         "id2label": train_topics.id2label, "label2id": train_topics.label2id},
+        "example": topics_example,
+        "csv_rows": train_topics.iter_rows,
+        "trainer": train_topics.MultiLabelTrainer,
+    },
+}
+
+
+# ------------------------
+# Watermark
+# ------------------------
+def load_state(save_dir: str) -> dict:
+    try:
+        with open(os.path.join(save_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"watermark": 0}
+
+def is_checkpoint(save_dir: str) -> bool:
+    return os.path.isfile(os.path.join(save_dir, "config.json"))
+
+
+# ------------------------
+# Rows from SQLite
+# ------------------------
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def delta_bounds(conn, watermark: int, limit: int = MAX_DELTA):
+    """(new watermark, row count) of the next delta after `watermark`, ending before the first pending row."""
+    row = conn.execute("""
+        SELECT MAX(revision), COUNT(*) FROM (
+            SELECT revision FROM saved_ideas
+            WHERE revision > ?1 AND enrichment_status = 'done'
+              AND revision < COALESCE((SELECT MIN(revision) FROM saved_ideas
+                                       WHERE revision > ?1 AND enrichment_status = 'pending'), 1 << 62)
+            ORDER BY revision LIMIT ?2
+        )
+    """, (watermark, limit)).fetchone()
+    return (row[0] or watermark), row[1]
+
+def iter_saved(conn, low: int, high: int, example):
+    """Examples from finished, user-labelled rows with low < revision <= high, streamed in revision order."""
+    cur = conn.execute("""
+        SELECT idea, sentiment, label FROM saved_ideas
+        WHERE revision > ? AND revision <= ? AND enrichment_status = 'done' AND model_version = ?
+        ORDER BY revision
+    """, (low, high, USER_VERSION))
+    for idea, sentiment, label in cur:
+        ex = example(idea, sentiment, label)
+        if ex is not None:
+            yield ex
+
+def replay_sample(rows, k: int, rng: random.Random) -> list:
+    """Uniform sample of k items from a stream of unknown length (reservoir sampling)."""
+    sample = []
+    for i, row in enumerate(rows):
+        if i < k:
+            sample.append(row)
+        else:
+            j = rng.randrange(i + 1)
+            if j < k:
+                sample[j] = row
+    return sample
+
+
+# ------------------------
+# Training
+# ------------------------
+def run(task_name: str, db_path: str, replay_ratio: float, epochs: float, learning_rate: float,
+        batch_size: int, seed: int, dry_run: bool = False) -> dict:
+    task = TASKS[task_name]
+    current = registry.resolve(task_name)
+    warm = current is not None and is_checkpoint(current.path)
+    state = load_state(current.path) if warm else {"watermark": 0}
+    watermark = state["watermark"]
+    rng = random.Random(seed)
+
+    conn = connect(db_path)
+    try:
+        high, changed = delta_bounds(conn, watermark)
+        delta = list(iter_saved(conn, watermark, high, task["example"])) if changed else []
+        k = int(round(len(delta) * replay_ratio))
+        # Replay: older saved ideas plus the seed CSV the model started from
+        old = iter_saved(conn, 0, watermark, task["example"])
+        replay = replay_sample((r for source in (old, task["csv_rows"]()) for r in source), k, rng) if k else []
+    finally:
+        conn.close()
+
+    summary = {
+        "task": task_name, "warm_start": current.key if warm else None, "from_watermark": watermark, "to_watermark": high,
+        "changed_rows": changed, "delta_examples": len(delta), "replay_examples": len(replay),
+    }
+    print(f"📊 {task_name}: {changed} changed rows -> {len(delta)} examples, {len(replay)} replayed "
+          f"(watermark {watermark} -> {high}, {'warm start from ' + current.key if warm else 'cold start'})")
+    if dry_run or len(delta) < MIN_DELTA:
+        if not dry_run:
+            print(f"⏭️ Fewer than {MIN_DELTA} new examples; {task_name} model left unchanged")
+        return summary
+
+    source = current.path if warm else task["base_model"]
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        source, **({} if warm else task["model_kwargs"])
+    )
+    # Hold out part of a large enough delta to report how well the new data is fitted
+    val = [e for e in delta if in_validation(e["text"])] if len(delta) >= 20 else []
+    train = [e for e in delta if not val or not in_validation(e["text"])] + replay
+    train_ds = tokenize_rows(lambda: iter(train), tokenizer)
+
+    args = TrainingArguments(
+        output_dir=f"ml/_{task_name}_incremental_runs",
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=batch_size,
+        learning_rate=learning_rate,
+        num_train_epochs=epochs,
+        weight_decay=0.01,
+        logging_steps=20,
+        save_strategy="no",
+        seed=seed,
+        **TRAINING_ARGS,
+    )
+    trainer = task["trainer"](
+        model=model,
+        args=args,
+        train_dataset=train_ds,
+        tokenizer=tokenizer,
+        data_collator=collator(tokenizer),
+    )
+    started = time.perf_counter()
+    trainer.train()
+    summary["train_seconds"] = round(time.perf_counter() - started, 1)
+    if val:
+        summary["eval_loss"] = trainer.evaluate(tokenize_rows(lambda: iter(val), tokenizer))["eval_loss"]
+
+    staging = tempfile.mkdtemp(prefix=f"{task_name}-incremental-")
+    try:
+        trainer.save_model(staging)
+        tokenizer.save_pretrained(staging)
+        new_state = dict(summary, watermark=high, base=source, trained_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        with open(os.path.join(staging, STATE_FILE), "w") as f:
+            json.dump(new_state, f, indent=2)
+        summary["version"] = registry.publish(task_name, staging, note=f"incremental to revision {high}")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    print(f"✅ {task_name} {summary['version']} published and active "
+          f"(watermark {high}, {summary['train_seconds']}s)")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the current models on new saved ideas")
+    parser.add_argument("--task", choices=[*TASKS, "all"], default="all")
+    parser.add_argument("--db", default=DATABASE)
+    parser.add_argument("--replay-ratio", type=float, default=REPLAY_RATIO,
+                        help="replayed examples per new example")
+    parser.add_argument("--epochs", type=float, default=1)
+    parser.add_argument("--learning-rate", type=float, default=2e-5)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dry-run", action="store_true", help="only report the delta and replay sizes")
+    args = parser.parse_args()
+
+    for name in (TASKS if args.task == "all" else [args.task]):
+        run(name, args.db, args.replay_ratio, args.epochs, args.learning_rate,
+            args.batch_size, args.seed, args.dry_run)
+
+if __name__ == "__main__":
+    main()
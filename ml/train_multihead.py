@@ -0,0 +1,68 @@
+# ml/train_multihead.py
+import os
+from transformers import AutoTokenizer, Trainer, TrainingArguments
+from ml.labels import TOPIC_LABELS
+from ml.multihead import MultiHeadClassifier
+from ml.data import iter_csv, tokenized_splits, collator, TRAINING_ARGS
+from ml.train_sentiment import label2id as sentiment2id
+from ml.train_topics import encode_labels
+
+MODEL_NAME = "distilbert-base-uncased"
+SAVE_DIR = "ml/multihead_model"
+
+def iter_rows(sentiment_path="data/ideas.csv", topics_path="data/ideas_topics.csv"):
+    """
+    Both corpora as one stream. Rows only carry the labels their source
+    file has; the missing task is masked out of the loss.
+    """
+    no_topics = [0] * len(TOPIC_LABELS)
+    for row in iter_csv(sentiment_path):
+        if row.get("sentiment") in sentiment2id:
+            yield {"text": row["text"], "sentiment_labels": sentiment2id[row["sentiment"]],
+                   "topic_labels": no_topics, "topic_mask": 0}
+    for row in iter_csv(topics_path):
+        yield {"text": row["text"], "sentiment_labels": -100,
+               "topic_labels": encode_labels(row.get("topics")), "topic_mask": 1}
+
+def load_data(tokenizer, sentiment_path="data/ideas.csv", topics_path="data/ideas_topics.csv"):
+    splits = tokenized_splits(
+        "multihead", lambda: iter_rows(sentiment_path, topics_path), [sentiment_path, topics_path], tokenizer
+    )
+    return splits["train"], splits["validation"]
+
+def main():
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = MultiHeadClassifier.from_encoder(MODEL_NAME)
+    train_ds, val_ds = load_data(tokenizer)
+
+    args = TrainingArguments(
+        output_dir="ml/_multihead_runs",
+        per_device_train_batch_size=16,
+        per_device_eval_batch_size=16,
+        evaluation_strategy="epoch",
+        learning_rate=3e-5,
+        num_train_epochs=4,
+        weight_decay=0.01,
+        logging_steps=20,
+        save_strategy="no",
+        label_names=["sentiment_labels", "topic_labels", "topic_mask"],
+        **TRAINING_ARGS,
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=args,
+        train_dataset=train_ds,
+        eval_dataset=val_ds,
+        tokenizer=tokenizer,
+        data_collator=collator(tokenizer),
+    )
+
+    trainer.train()
+    model.save_pretrained(SAVE_DIR)
+    tokenizer.save_pretrained(SAVE_DIR)
+    print(f"✅ Multi-head model saved to {SAVE_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,32 @@
 # ml/train_sentiment.py
 import os
-import pandas as pd
-from sklearn.model_selection import train_test_split
 from transformers import (AutoTokenizer, AutoModelForSequenceClassification,
                           Trainer, TrainingArguments)
 import torch
-from datasets import Dataset
+from ml.data import iter_csv, tokenized_splits, collator, TRAINING_ARGS
 
 MODEL_NAME = "distilbert-base-uncased"
 SAVE_DIR = "ml/sentiment_model"
+DATA_PATH = "data/ideas.csv"
 
 label2id = {"negative": 0, "neutral": 1, "positive": 2}
 id2label = {v: k for k, v in label2id.items()}
 
-def load_data(path="data/ideas.csv"):
-    df = pd.read_csv(path)
-    df["label"] = df["sentiment"].map(label2id)
-    return train_test_split(df, test_size=0.2, random_state=42)
+def iter_rows(path=DATA_PATH):
+    """Streams (text, label) rows; rows with an unknown sentiment are skipped."""
+    for row in iter_csv(path):
+        if row.get("sentiment") in label2id:
+            yield {"text": row["text"], "label": label2id[row["sentiment"]]}
 
-def tokenize_function(examples, tokenizer):
-    return tokenizer(examples["text"], truncation=True, padding="max_length", max_length=256)
+def load_data(tokenizer, path=DATA_PATH):
+    splits = tokenized_splits("sentiment", lambda: iter_rows(path), [path], tokenizer)
+    return splits["train"], splits["validation"]
 
 def main():
     os.makedirs(SAVE_DIR, exist_ok=True)
-    train_df, val_df = load_data()
-
     tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    train_ds, val_ds = load_data(tokenizer)
+
     model = AutoModelForSequenceClassification.from_pretrained(
         MODEL_NAME,
         num_labels=3,
@@ -33,17 +34,6 @@ def main():
         label2id=label2id,
     )
 
-    train_ds = Dataset.from_pandas(train_df[["text", "label"]])
-    val_ds   = Dataset.from_pandas(val_df[["text", "label"]])
-
-    train_ds = train_ds.map(lambda x: tokenize_function(x, tokenizer), batched=True)
-    val_ds   = val_ds.map(lambda x: tokenize_function(x, tokenizer), batched=True)
-
-    train_ds = train_ds.remove_columns(["text"])
-    val_ds   = val_ds.remove_columns(["text"])
-    train_ds.set_format("torch")
-    val_ds.set_format("torch")
-
     args = TrainingArguments(
         output_dir="ml/_sentiment_runs",
         per_device_train_batch_size=16,
@@ -55,7 +45,8 @@ def main():
         logging_steps=20,
         save_strategy="epoch",
         load_best_model_at_end=True,
-        metric_for_best_model="eval_loss"
+        metric_for_best_model="eval_loss",
+        **TRAINING_ARGS,
     )
 
     trainer = Trainer(
@@ -64,6 +55,7 @@ def main():
         train_dataset=train_ds,
         eval_dataset=val_ds,
         tokenizer=tokenizer,
+        data_collator=collator(tokenizer),
     )
 
     trainer.train()
@@ -1,15 +1,15 @@
 # ml/train_topics.py
 import os
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
+import torch
 from transformers import (AutoTokenizer, AutoModelForSequenceClassification,
                           Trainer, TrainingArguments)
-from datasets import Dataset
 from ml.labels import TOPIC_LABELS
+from ml.data import iter_csv, tokenized_splits, collator, TRAINING_ARGS
 
 MODEL_NAME = "distilbert-base-uncased"
 SAVE_DIR = "ml/topic_model"
+DATA_PATH = "data/ideas_topics.csv"
 
 label2id = {label: i for i, label in enumerate(TOPIC_LABELS)}
 id2label = {v: k for k, v in label2id.items()}
@@ -23,18 +23,27 @@ def encode_labels(topic_str):
                 multi_hot[label2id[t]] = 1
     return multi_hot.tolist()
 
-def load_data(path="data/ideas_topics.csv"):
-    df = pd.read_csv(path)
-    df["labels"] = df["topics"].apply(encode_labels)
-    return train_test_split(df, test_size=0.2, random_state=42)
+class MultiLabelTrainer(Trainer):
+    """Trainer with BCEWithLogits loss over multi-hot (integer) labels."""
 
-def tokenize_function(examples, tokenizer):
-    return tokenizer(examples["text"], truncation=True, padding="max_length", max_length=256)
+    def compute_loss(self, model, inputs, return_outputs=False):
+        labels = inputs.get("labels")
+        outputs = model(**{k: v for k, v in inputs.items() if k != "labels"})
+        loss = torch.nn.BCEWithLogitsLoss()(outputs.logits, labels.float())
+        return (loss, outputs) if return_outputs else loss
+
+def iter_rows(path=DATA_PATH):
+    for row in iter_csv(path):
+        yield {"text": row["text"], "labels": encode_labels(row.get("topics"))}
+
+def load_data(tokenizer, path=DATA_PATH):
+    splits = tokenized_splits("topics", lambda: iter_rows(path), [path], tokenizer)
+    return splits["train"], splits["validation"]
 
 def main():
     os.makedirs(SAVE_DIR, exist_ok=True)
-    train_df, val_df = load_data()
     tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    train_ds, val_ds = load_data(tokenizer)
 
     model = AutoModelForSequenceClassification.from_pretrained(
         MODEL_NAME,
@@ -44,20 +53,6 @@ def main():
         label2id=label2id,
     )
 
-    train_ds = Dataset.from_pandas(train_df[["text", "labels"]])
-    val_ds   = Dataset.from_pandas(val_df[["text", "labels"]])
-
-    train_ds = train_ds.map(lambda x: tokenize_function(x, tokenizer), batched=True)
-    val_ds   = val_ds.map(lambda x: tokenize_function(x, tokenizer), batched=True)
-
-    def set_format(ds):
-        ds = ds.remove_columns(["text"])
-        ds.set_format(type="torch")
-        return ds
-
-    train_ds = set_format(train_ds)
-    val_ds   = set_format(val_ds)
-
     args = TrainingArguments(
         output_dir="ml/_topic_runs",
         per_device_train_batch_size=16,
@@ -69,30 +64,17 @@ def main():
         logging_steps=20,
         save_strategy="epoch",
         load_best_model_at_end=True,
-        metric_for_best_model="eval_loss"
+        metric_for_best_model="eval_loss",
+        **TRAINING_ARGS,
     )
 
-    def compute_loss(model, inputs, return_outputs=False):
-        # Replace default loss with BCEWithLogits for multi-label
-        labels = inputs.get("labels")
-        outputs = model(**{k: v for k, v in inputs.items() if k != "labels"})
-        logits = outputs.logits
-        loss_fn = torch.nn.BCEWithLogitsLoss()
-        loss = loss_fn(logits, labels.float())
-        return (loss, outputs) if return_outputs else loss
-
-    # Small wrapper to plug a custom loss into Trainer
-    from transformers.trainer import Trainer as HFTrainer
-    class MyTrainer(HFTrainer):
-        def compute_loss(self, model, inputs, return_outputs=False):
-            return compute_loss(model, inputs, return_outputs)
-
-    trainer = MyTrainer(
+    trainer = MultiLabelTrainer(
         model=model,
         args=args,
         train_dataset=train_ds,
         eval_dataset=val_ds,
         tokenizer=tokenizer,
+        data_collator=collator(tokenizer),
     )
 
     trainer.train()
@@ -101,5 +83,4 @@ def main():
     print(f"✅ Topic model saved to {SAVE_DIR}")
 
 if __name__ == "__main__":
-    import torch  # make sure torch is available
     main()
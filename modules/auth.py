@@ -2,14 +2,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
+from modules.db import get_db
 
 auth_bp = Blueprint('auth', __name__)
 
-def get_db_connection():
-    conn = sqlite3.connect('database.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
 # Registration route
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -19,7 +15,7 @@ def register():
         password = request.form['password']
         hashed_password = generate_password_hash(password)
 
-        conn = get_db_connection()
+        conn = get_db()
         try:
             conn.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
                          (username, email, hashed_password))
@@ -27,9 +23,8 @@ def register():
             flash("Registration successful! Please login.", "success")
             return redirect(url_for('auth.login'))
         except sqlite3.IntegrityError:
+            conn.rollback()
             flash("Username or email already exists.", "danger")
-        finally:
-            conn.close()
     return render_template('register.html')
 
 # Login route
@@ -39,13 +34,12 @@ def login():
         user_input = request.form['user_input']  # This can be username or email
         password = request.form['password']
 
-        conn = get_db_connection()
+        conn = get_db()
         # Fetch user by username or email
         user = conn.execute(
             'SELECT * FROM users WHERE username = ? OR email = ?',
             (user_input, user_input)
         ).fetchone()
-        conn.close()
 
         if user and check_password_hash(user['password'], password):
             session['user_id'] = user['id']
@@ -0,0 +1,148 @@
+# modules/cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DB = os.getenv("COPILOT_CACHE_DB", "copilot_cache.db")
+CACHE_TTL = int(os.getenv("COPILOT_CACHE_TTL", 7 * 24 * 3600))        # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("COPILOT_CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_BYTES = int(os.getenv("COPILOT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def normalize_input(text: str) -> str:
+    """Collapse whitespace so trivially different submissions share a key."""
+    return " ".join((text or "").split())
+
+
+def make_key(tool_key: str, prompt: str, model: str, user_input: str) -> str:
+    h = hashlib.sha256()
+    for part in (tool_key, prompt, model, normalize_input(user_input)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache for LLM responses with TTL expiry and
+    LRU eviction by entry count and total size.
+    """
+
+    def __init__(self, path=CACHE_DB, ttl=CACHE_TTL,
+                 max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # SQLite connections must not cross fork (gunicorn preload, modules/preload.py)
+        os.register_at_fork(after_in_child=self._forget_connections)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache(accessed_at)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, created_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            if row is not None:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                conn.commit()
+            self._count(False)
+            return None
+        conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        self._count(True)
+        return row[0]
+
+    def set(self, key: str, value: str):
+        if not value:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode("utf-8")), now, now),
+        )
+        self._evict(conn)
+        conn.commit()
+
+    def _evict(self, conn):
+        if self.ttl:
+            conn.execute("DELETE FROM response_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk least-recently-used first until both limits hold again
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM response_cache ORDER BY accessed_at"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM response_cache WHERE key = ?", doomed)
+
+    def get_or_compute(self, key: str, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM response_cache")
+        conn.commit()
+
+    def stats(self) -> dict:
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
@@ -0,0 +1,143 @@
+# modules/db.py
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from flask import g
+from modules.metrics import span
+
+DATABASE = os.getenv("DATABASE_PATH", "database.db")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+STATEMENT_CACHE = 256  # prepared statements kept per connection
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",      # ~20 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose statements are recorded as "db" spans on /metrics."""
+
+    def execute(self, *args):
+        with span("db"):
+            return super().execute(*args)
+
+    def executemany(self, *args):
+        with span("db"):
+            return super().executemany(*args)
+
+    def executescript(self, *args):
+        with span("db"):
+            return super().executescript(*args)
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """A tuned standalone connection (scripts, background workers)."""
+    conn = sqlite3.connect(
+        path or DATABASE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE,
+        factory=TimedConnection,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Bounded pool of tuned connections. A connection is used by one thread
+    at a time and returned afterwards, so its statement cache is reused
+    across requests.
+    """
+
+    def __init__(self, path: str = None, max_size: int = POOL_SIZE):
+        self.path = path or DATABASE
+        self.max_size = max_size
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float = 10.0) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return connect(self.path)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("database connection pool exhausted")
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Process-wide pool; rebuilt after fork so workers never share handles."""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool()
+    return _pool
+
+
+# ------------------------
+# Flask request integration
+# ------------------------
+def get_db() -> sqlite3.Connection:
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+def close_db(error=None):
+    db = g.pop('db', None)
+    if db is not None:
+        get_pool().release(db)
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,159 @@
+# modules/embeddings.py
+"""
+Idea embeddings for "similar ideas" and near-duplicate warnings.
+
+Vectors are produced by ml.infer.embed_batch (mean-pooled encoder states)
+when an idea is enriched, stored as float16 blobs in `idea_embeddings`,
+and searched through an in-memory per-user ml.similarity.SimilarityIndex.
+Each process syncs a user's vectors incrementally (by row id) on demand,
+so rows written by other workers show up without a reload. The index only
+holds vectors of the current encoder version and is rebuilt when it
+changes; backfill() re-embeds the rows a previous version left behind.
+"""
+import os
+import threading
+import numpy as np
+from ml.similarity import SimilarityIndex
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.92))
+SIMILAR_K = 5
+
+_index = None
+_index_key = None  # (dim, model version) of _index
+_synced = {}   # user_id -> last idea_embeddings.id loaded into _index
+_lock = threading.Lock()
+_backfilled = None  # model version with no stale rows left
+
+
+def _model_version() -> str:
+    from ml.infer import embedding_version
+    return embedding_version()
+
+def _get_index(dim: int, version: str) -> SimilarityIndex:
+    global _index, _index_key
+    with _lock:
+        if _index is None or _index_key != (dim, version):
+            _index = SimilarityIndex(dim)
+            _index_key = (dim, version)
+            _synced.clear()
+        return _index
+
+def compute(texts: list[str], with_version: bool = False):
+    """Vectors for texts; with_version=True returns (vectors, model version)."""
+    from ml.infer import embed_batch
+    return embed_batch(texts, with_version=with_version)
+
+def store(conn, items, vectors: np.ndarray, version: str = None):
+    """
+    items: (idea_id, user_id) pairs aligned with vectors. Pass the version
+    compute() returned; the current one may have changed since. Caller commits.
+    """
+    version = version or _model_version()
+    conn.executemany(
+        "INSERT OR REPLACE INTO idea_embeddings (idea_id, user_id, model_version, vector) VALUES (?, ?, ?, ?)",
+        [(idea_id, user_id, version, vec.astype(np.float16).tobytes())
+         for (idea_id, user_id), vec in zip(items, vectors)],
+    )
+
+def backfill(conn, limit: int = 32) -> int:
+    """
+    Re-embed up to `limit` enriched ideas whose vector is missing or from
+    another encoder version. Returns how many were written; 0 once none
+    are left. Runs in autocommit mode like modules/enrichment.py.
+    """
+    global _backfilled
+    version = _model_version()
+    if version == _backfilled:
+        return 0
+    rows = conn.execute("""
+        SELECT s.id, s.user_id, s.idea, s.revision FROM saved_ideas s
+        LEFT JOIN idea_embeddings e ON e.idea_id = s.id
+        WHERE s.enrichment_status = 'done' AND (e.model_version IS NULL OR e.model_version != ?)
+        LIMIT ?
+    """, (version, limit)).fetchall()
+    if not rows:
+        _backfilled = version
+        return 0
+    vectors, version = compute([r["idea"] for r in rows], with_version=True)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # An idea edited meanwhile is re-embedded by its enrichment job
+        current = [i for i, r in enumerate(rows) if conn.execute(
+            "SELECT 1 FROM saved_ideas WHERE id = ? AND revision = ?", (r["id"], r["revision"])
+        ).fetchone()]
+        store(conn, [(rows[i]["id"], rows[i]["user_id"]) for i in current], vectors[current], version)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(current)
+
+def _sync(db, user_id, dim: int, version: str):
+    index = _get_index(dim, version)
+    last = _synced.get(user_id, 0)
+    rows = db.execute(
+        "SELECT id, idea_id, vector FROM idea_embeddings WHERE user_id = ? AND id > ? AND model_version = ? ORDER BY id",
+        (user_id, last, version),
+    ).fetchall()
+    if rows:
+        vectors = np.frombuffer(b"".join(r["vector"] for r in rows), dtype=np.float16).reshape(len(rows), -1)
+        index.upsert(user_id, [r["idea_id"] for r in rows], vectors.astype(np.float32))
+        _synced[user_id] = rows[-1]["id"]
+    else:
+        index.user(user_id)
+    return index
+
+def forget(user_id, idea_id):
+    if _index is not None:
+        _index.remove(user_id, idea_id)
+
+def similar(db, user_id, text: str = None, idea_id: int = None, k: int = SIMILAR_K):
+    """
+    Top-k of the user's saved ideas most similar to `text` (or to saved idea
+    `idea_id`), as dicts with id, startup_name, tagline, score, duplicate.
+    """
+    if idea_id is not None:
+        row = db.execute(
+            "SELECT s.idea, e.model_version, e.vector FROM saved_ideas s "
+            "LEFT JOIN idea_embeddings e ON e.idea_id = s.id WHERE s.id = ? AND s.user_id = ?",
+            (idea_id, user_id),
+        ).fetchone()
+        if row is None or row["vector"] is None:
+            return []
+        version = _model_version()
+        if row["model_version"] == version:
+            query = np.frombuffer(row["vector"], dtype=np.float16).astype(np.float32)
+        else:
+            # Not backfilled yet: a vector from another encoder is not comparable
+            vectors, version = compute([row["idea"]], with_version=True)
+            query = vectors[0]
+    elif text:
+        vectors, version = compute([text], with_version=True)
+        query = vectors[0]
+    else:
+        return []
+
+    index = _sync(db, user_id, query.shape[-1], version)
+    hits = index.search(user_id, query, k, exclude=idea_id)
+    if not hits:
+        return []
+
+    # Drop ideas deleted by another process since they were indexed
+    ids = [i for i, _ in hits]
+    rows = {r["id"]: r for r in db.execute(
+        f"SELECT id, startup_name, tagline FROM saved_ideas WHERE user_id = ? AND id IN ({','.join('?' * len(ids))})",
+        (user_id, *ids),
+    )}
+    results = []
+    for hit_id, score in hits:
+        if hit_id not in rows:
+            index.remove(user_id, hit_id)
+            continue
+        results.append({
+            "id": hit_id,
+            "startup_name": rows[hit_id]["startup_name"],
+            "tagline": rows[hit_id]["tagline"],
+            "score": round(score, 4),
+            "duplicate": score >= DUPLICATE_THRESHOLD,
+        })
+    return results
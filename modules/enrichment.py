@@ -0,0 +1,249 @@
+# modules/enrichment.py
+"""
+Durable background enrichment of saved ideas.
+
+save_idea inserts the row with sentiment/label set to "pending" and queues
+a job in `enrichment_jobs` in the same transaction. Worker threads claim
+queued jobs in batches, score and embed the ideas through ml/infer.py
+and write the results back, then delete the finished jobs. A failed batch
+or a job whose worker died is picked up again (after its lease expires);
+after MAX_ATTEMPTS it is marked failed. Results are only written if the
+idea's revision is still the one that was scored: an idea edited
+meanwhile is left to the job its edit queued.
+
+Run standalone workers (e.g. next to gunicorn) with:
+
+    python -m modules.enrichment --workers 2
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+import uuid
+from modules.db import connect
+from modules import embeddings
+
+PENDING = "pending"
+USER_VERSION = "user"  # saved_ideas.model_version of sentiment/label a user set by hand
+WORKERS = int(os.getenv("ENRICHMENT_WORKERS", 2))
+BATCH_SIZE = int(os.getenv("ENRICHMENT_BATCH_SIZE", 32))
+POLL_SECONDS = float(os.getenv("ENRICHMENT_POLL_SECONDS", 2))
+LEASE_SECONDS = int(os.getenv("ENRICHMENT_LEASE_SECONDS", 300))
+MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", 3))
+
+log = logging.getLogger(__name__)
+_wakeup = threading.Event()
+
+
+# ------------------------
+# Queue operations
+# ------------------------
+def enqueue(db, idea_id: int):
+    """Queue enrichment for a saved idea. Runs inside the caller's transaction."""
+    db.execute(
+        "INSERT INTO enrichment_jobs (idea_id, status, attempts, created_at) VALUES (?, 'queued', 0, ?)",
+        (idea_id, time.time()),
+    )
+
+def notify():
+    """Wake idle in-process workers after a commit."""
+    _wakeup.set()
+
+def claim_batch(conn, worker_id: str, limit: int = BATCH_SIZE):
+    """Atomically lease up to `limit` queued (or expired) jobs."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Leases held by crashed workers go back to the queue, unless out of attempts
+        expired = now - LEASE_SECONDS
+        conn.execute(
+            "UPDATE saved_ideas SET enrichment_status = 'failed' WHERE id IN ("
+            "SELECT idea_id FROM enrichment_jobs WHERE status = 'running' AND locked_at < ? AND attempts >= ?)",
+            (expired, MAX_ATTEMPTS),
+        )
+        conn.execute(
+            "UPDATE enrichment_jobs SET locked_by = NULL, last_error = 'lease expired', "
+            "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END "
+            "WHERE status = 'running' AND locked_at < ?",
+            (MAX_ATTEMPTS, expired),
+        )
+        jobs = conn.execute(
+            "SELECT j.id, j.idea_id, j.attempts, s.user_id, s.idea, s.revision FROM enrichment_jobs j "
+            "JOIN saved_ideas s ON s.id = j.idea_id "
+            "WHERE j.status = 'queued' ORDER BY j.id LIMIT ?",
+            (limit,),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE enrichment_jobs SET status = 'running', locked_by = ?, locked_at = ?, "
+            "attempts = attempts + 1 WHERE id = ?",
+            [(worker_id, now, job["id"]) for job in jobs],
+        )
+        # Jobs whose idea was deleted meanwhile have nothing left to do
+        conn.execute(
+            "DELETE FROM enrichment_jobs WHERE status = 'queued' "
+            "AND idea_id NOT IN (SELECT id FROM saved_ideas)"
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return jobs
+
+def score(texts: list[str]) -> list[tuple[str, str, str]]:
+    """
+    (sentiment, label, model version) per text from the ml/infer models.
+    Raises if the models fail, so the job is retried instead of completed
+    with keyword-rule guesses; those only stand in when there are no models.
+    """
+    from labeler import DEFAULT_LABEL, predict_labels_batch
+    try:
+        import ml.infer
+    except ImportError:
+        # No torch/transformers in this deployment: keyword rules only
+        log.warning("ml.infer unavailable; labelling with keyword rules", exc_info=True)
+        use_models = False
+    else:
+        use_models = ml.infer.models_configured()
+    if use_models:
+        predicted, version = ml.infer.predict_all_batch(texts, with_version=True, fallback=False)
+    else:
+        predicted, version = [("neutral", labels) for labels in predict_labels_batch(texts)], "keywords"
+    return [(sentiment, ", ".join(topics) or DEFAULT_LABEL, version) for sentiment, topics in predicted]
+
+def complete(conn, jobs, results, vectors=None, vector_version=None) -> int:
+    """Write back results and delete the jobs. Returns how many ideas were still current."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = []
+        for i, (job, (sentiment, label, version)) in enumerate(zip(jobs, results)):
+            # Labels the user set by hand are kept; the job still embeds the idea
+            cur = conn.execute(
+                "UPDATE saved_ideas SET enrichment_status = 'done', "
+                "sentiment = CASE WHEN model_version IS ?1 THEN sentiment ELSE ?2 END, "
+                "label = CASE WHEN model_version IS ?1 THEN label ELSE ?3 END, "
+                "model_version = CASE WHEN model_version IS ?1 THEN model_version ELSE ?4 END "
+                "WHERE id = ?5 AND revision = ?6",
+                (USER_VERSION, sentiment, label, version, job["idea_id"], job["revision"]),
+            )
+            if cur.rowcount:
+                current.append(i)
+        if vectors is not None:
+            embeddings.store(conn, [(jobs[i]["idea_id"], jobs[i]["user_id"]) for i in current],
+                             vectors[current], vector_version)
+        conn.executemany("DELETE FROM enrichment_jobs WHERE id = ?", [(job["id"],) for job in jobs])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(current)
+
+def fail(conn, jobs, error: Exception):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for job in jobs:
+            final = job["attempts"] + 1 >= MAX_ATTEMPTS
+            conn.execute(
+                "UPDATE enrichment_jobs SET status = ?, locked_by = NULL, last_error = ? WHERE id = ?",
+                ("failed" if final else "queued", str(error), job["id"]),
+            )
+            if final:
+                conn.execute(
+                    "UPDATE saved_ideas SET enrichment_status = 'failed' WHERE id = ? AND revision = ?",
+                    (job["idea_id"], job["revision"]),
+                )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def run_once(conn, worker_id: str, limit: int = BATCH_SIZE) -> int:
+    """Claim, score and write back one batch. Returns the number of jobs handled."""
+    jobs = claim_batch(conn, worker_id, limit)
+    if not jobs:
+        return 0
+    try:
+        results = score([job["idea"] for job in jobs])
+    except Exception as e:
+        log.exception("Enrichment batch failed")
+        fail(conn, jobs, e)
+        return len(jobs)
+    try:
+        vectors, vector_version = embeddings.compute([job["idea"] for job in jobs], with_version=True)
+    except Exception:
+        # Similarity search is optional; don't hold back sentiment/label for it
+        log.warning("Skipping embeddings for this batch", exc_info=True)
+        vectors = vector_version = None
+    complete(conn, jobs, results, vectors, vector_version)
+    return len(jobs)
+
+
+# ------------------------
+# Worker pool
+# ------------------------
+class EnrichmentWorkers:
+    def __init__(self, num_workers: int = WORKERS, batch_size: int = BATCH_SIZE,
+                 poll_seconds: float = POLL_SECONDS, db_path: str = None):
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.db_path = db_path
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _loop(self):
+        worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # autocommit mode; claim/complete manage their own transactions
+        conn = connect(self.db_path)
+        conn.isolation_level = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    handled = run_once(conn, worker_id, self.batch_size)
+                except Exception:
+                    log.exception("Enrichment worker error")
+                    handled = 0
+                if not handled:
+                    try:
+                        # Idle: catch up on embeddings from a previous encoder version
+                        handled = embeddings.backfill(conn, self.batch_size)
+                    except Exception:
+                        log.debug("Embedding backfill skipped", exc_info=True)
+                if not handled:
+                    _wakeup.wait(self.poll_seconds)
+                    _wakeup.clear()
+        finally:
+            conn.close()
+
+    def start(self):
+        for i in range(self.num_workers):
+            t = threading.Thread(target=self._loop, name=f"enrichment-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        _wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run saved-idea enrichment workers")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    pool = EnrichmentWorkers(args.workers, args.batch_size, args.poll).start()
+    print(f"✅ {args.workers} enrichment workers running (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop(timeout=10)
+
+if __name__ == "__main__":
+    main()
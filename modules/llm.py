@@ -0,0 +1,411 @@
+# modules/llm.py
+"""
+Resilient wrapper around the Gemini client.
+
+Every call gets:
+  - a deadline covering all attempts (the SDK's own HTTP timeout is set
+    to whatever time is left, and the caller stops waiting on time even
+    if the SDK does not)
+  - retries of transient failures (429/5xx, timeouts, connection errors)
+    with full-jitter exponential backoff
+  - a bounded number of in-flight upstream requests per process, so a
+    slow upstream cannot absorb every web worker thread
+  - a circuit breaker: after FAILURE_THRESHOLD failed calls in a row,
+    calls fail immediately with CircuitOpenError for RESET_SECONDS, and
+    callers fall back to their offline defaults
+  - optional hedging: if the first attempt has not answered after
+    HEDGE_AFTER seconds, a second identical request is sent and the
+    first response wins
+
+agenerate()/astream() apply the same rules on the SDK's asyncio client
+for the ASGI entry point (asgi.py), with their own, larger concurrency cap.
+
+Each upstream request is timed as a span on /metrics (modules/metrics.py):
+"generate_content" per request (hedges and retries included) and
+"generate_content_stream" up to the first chunk of a stream.
+
+GEMINI_BASE_URL points the SDK at another endpoint, e.g. the local fake
+server in bench/fake_gemini.py.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules.metrics import span
+
+TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", 30))                # seconds per call, all attempts
+MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", 3))
+BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", 0.5))     # seconds
+BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", 8))
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+MAX_ASYNC_CONCURRENCY = int(os.getenv("GEMINI_MAX_ASYNC_CONCURRENCY", 256))
+FAILURE_THRESHOLD = int(os.getenv("GEMINI_BREAKER_FAILURES", 5))
+RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET", 30))
+HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", 0))          # seconds; 0 disables hedging
+BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+log = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(RuntimeError):
+    """The call was not attempted or gave up; callers should fall back."""
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+class LLMBusyError(LLMUnavailableError):
+    pass
+
+class LLMTimeoutError(LLMUnavailableError, TimeoutError):
+    pass
+
+
+def is_retryable(exc: BaseException) -> bool:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+        return isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+    except ImportError:
+        return False
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls. Once `reset_seconds`
+    have passed, one probe call is let through per window; its success
+    closes the circuit again.
+    """
+
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, reset_seconds: float = RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return "closed" if self.opened_at is None else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_seconds:
+                return False
+            self.opened_at = now  # restart the window: this call is the probe
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class ResilientGemini:
+    def __init__(self, client_factory, model: str, timeout: float = TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, max_concurrency: int = MAX_CONCURRENCY,
+                 hedge_after: float = HEDGE_AFTER, breaker: CircuitBreaker = None,
+                 max_async_concurrency: int = MAX_ASYNC_CONCURRENCY):
+        self.client_factory = client_factory
+        self.model = model
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Two threads per slot leaves room for hedges and abandoned attempts
+        self._pool = ThreadPoolExecutor(max_workers=2 * max_concurrency, thread_name_prefix="gemini")
+        # asyncio callers (asgi.py) hold no threads, so they get a much larger cap
+        self.max_async_concurrency = max_async_concurrency
+        self._async_slots = None
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "failures": 0, "rejected": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    # ------------------------
+    # Single upstream request
+    # ------------------------
+    @staticmethod
+    def _config(deadline_at: float) -> dict:
+        remaining_ms = max(1, int((deadline_at - time.monotonic()) * 1000))
+        return {"http_options": {"timeout": remaining_ms}}
+
+    def _acquire(self, deadline_at: float, blocking: bool = True):
+        if blocking:
+            acquired = self._slots.acquire(timeout=max(0.0, deadline_at - time.monotonic()))
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            self._count("rejected")
+            raise LLMBusyError("too many Gemini requests in flight")
+
+    def _submit(self, contents, deadline_at: float, blocking: bool = True):
+        self._acquire(deadline_at, blocking)
+
+        def call():
+            with span("generate_content"):
+                return self.client_factory().models.generate_content(
+                    model=self.model, contents=contents, config=self._config(deadline_at)
+                )
+        try:
+            # The caller's context carries its route/tool metric labels into the pool
+            future = self._pool.submit(contextvars.copy_context().run, call)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the request really finishes, even if nobody waits for it
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _attempt(self, contents, deadline_at: float):
+        """One logical attempt, plus a hedged duplicate if it is slow."""
+        pending = {self._submit(contents, deadline_at)}
+        hedged = not self.hedge_after
+        error = None
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            window = remaining if hedged else min(remaining, self.hedge_after)
+            done, pending = wait(pending, timeout=window, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not hedged and not done:
+                hedged = True
+                try:
+                    pending.add(self._submit(contents, deadline_at, blocking=False))
+                    self._count("hedges")
+                except LLMBusyError:
+                    pass
+        if error is not None and not pending:
+            raise error
+        raise LLMTimeoutError("Gemini did not answer before the deadline")
+
+    def _backoff_delay(self, attempt: int, deadline_at: float):
+        """Full-jitter delay before the next attempt; None when the deadline leaves no room."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        return None if time.monotonic() + delay >= deadline_at else delay
+
+    def _backoff(self, attempt: int, deadline_at: float) -> bool:
+        delay = self._backoff_delay(attempt, deadline_at)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
+
+    # ------------------------
+    # Public API
+    # ------------------------
+    def generate(self, contents, timeout: float = None):
+        """generate_content() with deadline, retries, breaker and hedging."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit open; using offline fallback")
+        self._count("calls")
+        deadline_at = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                resp = self._attempt(contents, deadline_at)
+            except Exception as e:
+                # LLMTimeoutError means the deadline is spent, so it is never retried
+                if (is_retryable(e) and not isinstance(e, LLMTimeoutError)
+                        and attempt < self.max_attempts and self._backoff(attempt, deadline_at)):
+                    self._count("retries")
+                    log.info("Retrying Gemini call after %r (attempt %d)", e, attempt)
+                    continue
+                self._record_error(e)
+                raise
+            self.breaker.record_success()
+            return resp
+
+    def stream(self, contents, timeout: float = None):
+        """
+        generate_content_stream() with the same protections. Retries only
+        happen before the first chunk; after that, errors reach the caller.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit open; using offline fallback")
+        self._count("calls")
+        deadline_at = time.monotonic() + (timeout or self.timeout)
+        self._acquire(deadline_at)
+        try:
+            chunks, first = self._open_stream(contents, deadline_at)
+            if first is not None:
+                yield first
+            yield from chunks
+        except Exception as e:
+            self._record_error(e)
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            self._slots.release()
+
+    def _open_stream(self, contents, deadline_at: float):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with span("generate_content_stream"):
+                    chunks = iter(self.client_factory().models.generate_content_stream(
+                        model=self.model, contents=contents, config=self._config(deadline_at)
+                    ))
+                    return chunks, next(chunks, None)
+            except Exception as e:
+                if not (is_retryable(e) and attempt < self.max_attempts and self._backoff(attempt, deadline_at)):
+                    raise
+                self._count("retries")
+
+    def _record_error(self, e: Exception):
+        if is_retryable(e):
+            self._count("failures")
+            self.breaker.record_failure()
+        elif not isinstance(e, LLMBusyError):
+            # The upstream answered (e.g. 400 bad request), so it is healthy
+            self.breaker.record_success()
+
+    # ------------------------
+    # asyncio API (used by asgi.py)
+    # ------------------------
+    async def _aacquire(self, deadline_at: float):
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_async_concurrency)
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), max(0.0, deadline_at - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._count("rejected")
+            raise LLMBusyError("too many Gemini requests in flight") from None
+
+    async def _acall(self, contents, deadline_at: float):
+        await self._aacquire(deadline_at)
+        try:
+            with span("generate_content"):
+                return await self.client_factory().aio.models.generate_content(
+                    model=self.model, contents=contents, config=self._config(deadline_at)
+                )
+        finally:
+            self._async_slots.release()
+
+    async def _aattempt(self, contents, deadline_at: float):
+        pending = {asyncio.ensure_future(self._acall(contents, deadline_at))}
+        hedged = not self.hedge_after
+        error = None
+        try:
+            while pending:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                window = remaining if hedged else min(remaining, self.hedge_after)
+                done, pending = await asyncio.wait(pending, timeout=window, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not hedged and not done:
+                    hedged = True
+                    if not self._async_slots.locked():
+                        pending.add(asyncio.ensure_future(self._acall(contents, deadline_at)))
+                        self._count("hedges")
+        finally:
+            # Unlike threads, the losing/late requests can really be cancelled
+            for task in pending:
+                task.cancel()
+        if error is not None and not pending:
+            raise error
+        raise LLMTimeoutError("Gemini did not answer before the deadline")
+
+    async def agenerate(self, contents, timeout: float = None):
+        """Async generate(); same deadline, retry, breaker and hedging rules."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit open; using offline fallback")
+        self._count("calls")
+        deadline_at = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                resp = await self._aattempt(contents, deadline_at)
+            except Exception as e:
+                delay = self._backoff_delay(attempt, deadline_at)
+                if (is_retryable(e) and not isinstance(e, LLMTimeoutError)
+                        and attempt < self.max_attempts and delay is not None):
+                    self._count("retries")
+                    await asyncio.sleep(delay)
+                    continue
+                self._record_error(e)
+                raise
+            self.breaker.record_success()
+            return resp
+
+    async def astream(self, contents, timeout: float = None):
+        """Async stream(); retries only before the first chunk."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit open; using offline fallback")
+        self._count("calls")
+        deadline_at = time.monotonic() + (timeout or self.timeout)
+        await self._aacquire(deadline_at)
+        try:
+            chunks, first = await self._aopen_stream(contents, deadline_at)
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            self._record_error(e)
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            self._async_slots.release()
+
+    async def _aopen_stream(self, contents, deadline_at: float):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with span("generate_content_stream"):
+                    chunks = await self.client_factory().aio.models.generate_content_stream(
+                        model=self.model, contents=contents, config=self._config(deadline_at)
+                    )
+                    try:
+                        return chunks, await chunks.__anext__()
+                    except StopAsyncIteration:
+                        return chunks, None
+            except Exception as e:
+                delay = self._backoff_delay(attempt, deadline_at)
+                if not (is_retryable(e) and attempt < self.max_attempts and delay is not None):
+                    raise
+                self._count("retries")
+                await asyncio.sleep(delay)
+
+    def status(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return dict(stats, breaker=self.breaker.state, consecutive_failures=self.breaker.failures)
@@ -0,0 +1,235 @@
+# modules/metrics.py
+"""
+Hot-path timing and a Prometheus /metrics endpoint.
+
+Two histograms, in the Prometheus text format (no client library needed):
+  app_request_duration_seconds{route, method, status}
+  app_span_duration_seconds{span, route, tool}
+
+A span times one step of a request: a Gemini call, tokenization, a model
+forward pass, a SQLite statement, template rendering. Spans pick up the
+route and Copilot tool of the request they run in from a context variable
+set in before_request. Work submitted to a thread pool keeps those labels
+when it runs under contextvars.copy_context() (see modules/llm.py). Spans
+recorded outside any request (enrichment workers, the micro-batcher
+thread) get route="background".
+
+Per-request profiling: when PROFILE_TOKEN is set, a request carrying
+`X-Profile: <PROFILE_TOKEN>` runs under pyinstrument (if installed) or
+cProfile. The report is written to PROFILE_DIR, and the response names
+the file in an X-Profile-File header. Only one request is profiled at a
+time. For streamed responses only the view function is covered, not the
+body generator.
+
+Metrics are per process; with several worker processes, scrape each one.
+"""
+import contextvars
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, g, request, before_render_template, template_rendered
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILER = os.getenv("PROFILER", "auto")  # "auto", "pyinstrument" or "cprofile"
+
+# Seconds; spans range from sub-millisecond statements to 30 s Gemini deadlines
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+BACKGROUND = ("background", "")
+_labels = contextvars.ContextVar("metrics_labels", default=BACKGROUND)
+
+log = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a fixed tuple of label names."""
+
+    def __init__(self, name: str, doc: str, labelnames: tuple, buckets: tuple = BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for values, series in sorted(snapshot.items()):
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, values))
+            sep = "," if labels else ""
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                running += count
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {running}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {running}")
+        return lines
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+request_seconds = Histogram(
+    "app_request_duration_seconds", "Time spent handling HTTP requests.", ("route", "method", "status")
+)
+span_seconds = Histogram(
+    "app_span_duration_seconds", "Time spent in instrumented steps of a request.", ("span", "route", "tool")
+)
+REGISTRY = [request_seconds, span_seconds]
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------
+# Spans
+# ------------------------
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as `name`, labelled with the current route and tool."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_seconds.observe(time.perf_counter() - started, name, *_labels.get())
+
+def timed(name: str = None):
+    """Decorator form of span(); defaults to the function's name."""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def set_labels(route: str, tool: str = ""):
+    _labels.set((route, tool))
+
+
+# ------------------------
+# Profiling
+# ------------------------
+_profile_lock = threading.Lock()
+
+def _profiling_requested() -> bool:
+    token = request.headers.get("X-Profile")
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN))
+
+def _start_profiler():
+    if PROFILER in ("auto", "pyinstrument"):
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return "pyinstrument", profiler
+        except ImportError:
+            if PROFILER == "pyinstrument":
+                raise
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return "cprofile", profiler
+
+def _stop_profiler(kind: str, profiler, route: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'}"
+    if kind == "pyinstrument":
+        profiler.stop()
+        path = os.path.join(PROFILE_DIR, f"{stem}.html")
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path = os.path.join(PROFILE_DIR, f"{stem}.prof")
+        profiler.dump_stats(path)  # inspect with: python -m pstats <file>
+    return path
+
+
+# ------------------------
+# Flask integration
+# ------------------------
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    set_labels(_route(), (request.view_args or {}).get("key", ""))
+    if _profiling_requested() and _profile_lock.acquire(blocking=False):
+        try:
+            g.profiler = _start_profiler()
+        except Exception:
+            _profile_lock.release()
+            log.exception("Could not start the profiler")
+
+def _after_request(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        request_seconds.observe(time.perf_counter() - started, _route(), request.method, str(response.status_code))
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        try:
+            response.headers["X-Profile-File"] = _stop_profiler(*profiler, _route())
+        except Exception:
+            log.exception("Could not write the profile")
+        finally:
+            _profile_lock.release()
+    elif _profiling_requested():
+        response.headers["X-Profile-File"] = "busy"
+    return response
+
+def _teardown_request(error=None):
+    # A request that raised before after_request still owns the profiler
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        try:
+            _stop_profiler(*profiler, _route())
+        finally:
+            _profile_lock.release()
+    set_labels(*BACKGROUND)
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault("template_started", []).append(time.perf_counter())
+
+def _template_rendered(sender, template, context, **extra):
+    stack = g.get("template_started")
+    if stack:
+        span_seconds.observe(time.perf_counter() - stack.pop(), "render_template", *_labels.get())
+
+def metrics_view():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_rendered, app)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,123 @@
+# modules/preload.py
+"""
+Loading the ml/infer.py scoring models in the web process.
+
+warm_up() loads them on a background thread at startup, so the first
+saved idea does not wait for them; /ready reports status().
+
+With pre-forked workers they are loaded once and shared copy-on-write
+instead. With gunicorn's preload_app (see gunicorn.conf.py), app.py is
+imported once, in the master. preload() then loads the ml/infer.py models
+there and runs one warm-up pass, before any worker is forked. Forked
+workers share those pages with the master for as long as nobody writes
+to them:
+  - the models are in eval mode with requires_grad off, and inference
+    runs under no_grad, so the weights are only ever read
+  - gc.freeze() moves everything the master created into the permanent
+    generation, so the workers' garbage collections don't write to (and
+    copy) those objects' pages
+  - the master warms up on a single torch thread, so no OpenMP thread
+    pool exists at fork time; configure_worker() then gives each worker
+    its share of the cores
+
+Threads don't survive fork, so with PRELOAD_MODELS=1 app.py starts its
+background threads (enrichment workers) in each worker instead, from the
+gunicorn post_worker_init hook. Measure the effect with
+bench/worker_memory.py.
+"""
+import gc
+import logging
+import os
+import threading
+import time
+
+ENABLED = os.getenv("PRELOAD_MODELS", "0") == "1"
+
+# Intra-op threads per worker; 0 divides the cores evenly between workers
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", 0))
+
+log = logging.getLogger(__name__)
+_status = "loading"  # set by load_models(); see status()
+_load_error = None
+
+
+def load_models():
+    """Load the scoring models and the embedding encoder; the outcome is kept for /ready."""
+    global _status, _load_error
+    try:
+        import ml.infer
+        if not ml.infer.models_configured():
+            _status, _load_error = "keywords", None
+            return
+        ml.infer.load_models(encoder=True)
+    except ImportError as e:
+        _status, _load_error = "keywords", e  # no torch/transformers in this deployment
+        raise
+    except Exception as e:
+        _status, _load_error = "error", e
+        raise
+    _status, _load_error = "loaded", None
+
+def load_error():
+    return _load_error
+
+def status() -> str:
+    """"loaded", "keywords" (no models: keyword rules only), "error" or "loading"."""
+    return _status
+
+def warm_up(background: bool = True):
+    """
+    Load the models ahead of the first request. With background=True the
+    load runs on a daemon thread so the web process can start serving now.
+    """
+    def _load():
+        try:
+            load_models()
+        except Exception:
+            pass  # recorded in _load_error, surfaced by /ready
+
+    if not background:
+        _load()
+        return None
+    t = threading.Thread(target=_load, name="model-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def preload() -> dict:
+    """Load and warm every model in this process, then freeze the heap. Returns what loaded."""
+    import torch
+    # The fast tokenizers' Rust thread pool does not survive fork either
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    torch.set_num_threads(1)
+    started = time.perf_counter()
+    loaded = {}
+
+    try:
+        import ml.infer
+        if ml.infer.BACKEND == "onnx":
+            # onnxruntime sessions own thread pools that break across fork
+            raise RuntimeError("the onnx backend loads per worker")
+        load_models()
+        if _status == "loaded":
+            models = ml.infer.active_models()
+            models.warm()
+            loaded["models"] = models.scoring_version()
+        else:
+            loaded["models"] = None
+    except Exception as e:
+        log.warning("ml.infer models not preloaded: %s", e)
+        loaded["models"] = None
+
+    gc.collect()
+    gc.freeze()
+    log.info("Preloaded models in %.1fs: %s", time.perf_counter() - started, loaded)
+    return loaded
+
+def worker_threads(workers: int) -> int:
+    return TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def configure_worker(workers: int):
+    """Run in each worker right after fork."""
+    import torch
+    torch.set_num_threads(worker_threads(workers))
@@ -0,0 +1,134 @@
+# modules/render.py
+"""
+Markdown -> HTML for Copilot output.
+
+Converters are built once per thread and reset between documents, and
+rendered HTML is kept in an in-memory LRU keyed by a hash of the
+markdown, so re-showing a stored answer costs a dict lookup.
+
+MARKDOWN_BACKEND picks the renderer at startup:
+  markdown  Python-Markdown with extra/tables/sane_lists/toc (default)
+  cmark     cmarkgfm, the C GitHub-flavored renderer (pip install cmarkgfm)
+  auto      cmark when installed, else markdown
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from markupsafe import escape
+
+BACKEND = os.getenv("MARKDOWN_BACKEND", "markdown")
+CACHE_SIZE = int(os.getenv("MARKDOWN_CACHE_SIZE", 512))
+MARKDOWN_EXTENSIONS = ["extra", "tables", "sane_lists", "toc"]
+
+log = logging.getLogger(__name__)
+
+
+# ------------------------
+# Backends
+# ------------------------
+_local = threading.local()
+
+def _render_markdown(md_text: str) -> str:
+    # markdown.Markdown instances are not thread-safe; keep one per thread
+    md = getattr(_local, "md", None)
+    if md is None:
+        import markdown
+        md = _local.md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    try:
+        return md.convert(md_text)
+    finally:
+        md.reset()
+
+def _render_cmark(md_text: str) -> str:
+    import cmarkgfm
+    return cmarkgfm.github_flavored_markdown_to_html(md_text)
+
+_RENDERERS = {"markdown": _render_markdown, "cmark": _render_cmark}
+
+def _select(name: str):
+    if name == "auto":
+        try:
+            import cmarkgfm  # noqa: F401
+            name = "cmark"
+        except ImportError:
+            name = "markdown"
+    if name not in _RENDERERS:
+        raise ValueError(f"Unknown MARKDOWN_BACKEND {name!r}; expected one of {sorted(_RENDERERS)} or 'auto'")
+    return name, _RENDERERS[name]
+
+backend_name, _render = _select(BACKEND)
+
+
+# ------------------------
+# Rendered-HTML cache
+# ------------------------
+class RenderCache:
+    """Thread-safe LRU of rendered HTML keyed by the markdown's sha256."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            html = self._data.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key: str, html: str):
+        with self._lock:
+            self._data[key] = html
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": backend_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "size": len(self._data),
+                "capacity": self.max_entries,
+            }
+
+render_cache = RenderCache()
+
+
+def markdown_to_html(md_text: str, cache: bool = True) -> str:
+    """
+    Render markdown to HTML, falling back to a safe <pre> block if the
+    renderer fails. Pass cache=False for one-off text such as the partial
+    documents of a stream.
+    """
+    if not md_text:
+        return ""
+    key = hashlib.sha256(md_text.encode("utf-8")).hexdigest() if cache else None
+    if key:
+        html = render_cache.get(key)
+        if html is not None:
+            return html
+    try:
+        html = _render(md_text)
+    except Exception:
+        log.warning("Markdown rendering failed", exc_info=True)
+        return f'<pre style="white-space:pre-wrap">{escape(md_text)}</pre>'
+    if key:
+        render_cache.set(key, html)
+    return html
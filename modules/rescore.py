@@ -0,0 +1,222 @@
+# modules/rescore.py
+"""
+Bulk re-scoring of saved ideas after a model change.
+
+Streams saved_ideas in keyset order (id > last id, LIMIT chunk), scores
+each chunk through ml/infer.py (modules.enrichment.score) on a process
+pool, and writes sentiment/label back with one short executemany
+transaction per chunk. The live app stays responsive:
+  - reads are short keyset queries, never one long read transaction
+    that would hold back WAL checkpoints
+  - each write holds the write lock for one chunk only, so app writers
+    wait at most that long (busy_timeout)
+  - a row is only overwritten if its revision is unchanged since it was
+    read, so an idea edited meanwhile keeps its newer enrichment
+  - rows still queued for enrichment are skipped, and so are rows
+    already scored by the current models or labelled by hand
+    (saved_ideas.model_version)
+
+Progress is checkpointed to a JSON file after every chunk that completes
+the contiguous prefix of written chunks. An interrupted run resumes from
+there if the models are unchanged (see ml.infer.scoring_version()). Run
+from the repo root:
+
+    python -m modules.rescore --workers 4 --chunk-size 512
+    python -m modules.rescore --restart          # ignore the checkpoint
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+from modules.db import DATABASE, connect
+from modules.enrichment import PENDING, USER_VERSION
+
+CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", 512))
+BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", 64))  # texts per forward pass
+PROGRESS_SECONDS = 5
+
+log = logging.getLogger(__name__)
+
+
+# ------------------------
+# Worker processes
+# ------------------------
+def _init_worker(threads: int, batch_size: int):
+    import torch
+    import ml.infer
+    torch.set_num_threads(threads)
+    ml.infer.MAX_BATCH_SIZE = batch_size
+    # Fail the run rather than overwrite history with keyword-rule fallbacks;
+    # score() raises on a model failure mid-run for the same reason
+    ml.infer.load_models()
+
+def _score_chunk(rows):
+    from modules.enrichment import score
+    results = score([idea for _, _, idea in rows])
+    return [(sentiment, label, idea_id, revision, version)
+            for (idea_id, revision, _), (sentiment, label, version) in zip(rows, results)]
+
+
+# ------------------------
+# Checkpoint
+# ------------------------
+def load_checkpoint(path: str, version: str) -> dict:
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {"last_id": 0}
+    if state.get("version") != version:
+        print(f"⚠️ Checkpoint {path} is for other models; starting over")
+        return {"last_id": 0}
+    return state
+
+def save_checkpoint(path: str, state: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ------------------------
+# Reading and writing
+# ------------------------
+def read_chunk(conn, after_id: int, limit: int, version: str):
+    return [tuple(r) for r in conn.execute(
+        "SELECT id, revision, idea FROM saved_ideas "
+        "WHERE id > ? AND enrichment_status != ? AND model_version IS NOT ? AND model_version IS NOT ? "
+        "ORDER BY id LIMIT ?",
+        (after_id, PENDING, version, USER_VERSION, limit),
+    )]
+
+def write_results(conn, results) -> int:
+    """One short write transaction; returns the number of rows changed."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cur = conn.executemany("""
+            UPDATE saved_ideas SET sentiment = ?1, label = ?2, model_version = ?5, enrichment_status = 'done'
+            WHERE id = ?3 AND revision = ?4
+              AND (sentiment IS NOT ?1 OR label IS NOT ?2 OR model_version IS NOT ?5 OR enrichment_status != 'done')
+        """, results)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return cur.rowcount
+
+def run(db_path: str, workers: int, chunk_size: int = CHUNK_SIZE, batch_size: int = BATCH_SIZE,
+        checkpoint: str = None, restart: bool = False, dry_run: bool = False) -> dict:
+    checkpoint = checkpoint or f"{db_path}.rescore.json"
+    from ml.infer import scoring_version
+    version = scoring_version()
+    state = {"last_id": 0} if restart else load_checkpoint(checkpoint, version)
+    state.update(version=version)
+    state.setdefault("scanned", 0)
+    state.setdefault("updated", 0)
+
+    reader = connect(db_path)
+    writer = connect(db_path)
+    writer.isolation_level = None  # explicit BEGIN IMMEDIATE/COMMIT per chunk
+    total = reader.execute(
+        "SELECT COUNT(*) FROM saved_ideas "
+        "WHERE id > ? AND enrichment_status != ? AND model_version IS NOT ? AND model_version IS NOT ?",
+        (state["last_id"], PENDING, version, USER_VERSION),
+    ).fetchone()[0]
+    if state["last_id"]:
+        print(f"↩️ Resuming after id {state['last_id']} ({state['scanned']} rows done before)")
+    print(f"📊 Re-scoring {total} rows with {workers} workers, chunks of {chunk_size} ({version})")
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    pool = ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(threads, batch_size),
+    )
+    started = last_report = time.perf_counter()
+    scanned = updated = 0
+    order = deque()       # [last id of chunk, done] in submission order
+    in_flight = {}        # future -> entry in `order`
+    cursor = state["last_id"]
+    exhausted = False
+    try:
+        while True:
+            # Keep every worker busy with one chunk queued behind it
+            while not exhausted and len(in_flight) < 2 * workers:
+                rows = read_chunk(reader, cursor, chunk_size, version)
+                if not rows:
+                    exhausted = True
+                    break
+                cursor = rows[-1][0]
+                entry = [cursor, False]
+                order.append(entry)
+                in_flight[pool.submit(_score_chunk, rows)] = entry
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry = in_flight.pop(future)
+                results = future.result()
+                if not dry_run:
+                    updated += write_results(writer, results)
+                scanned += len(results)
+                entry[1] = True
+
+            # Checkpoint the contiguous prefix of finished chunks
+            advanced = False
+            while order and order[0][1]:
+                state["last_id"] = order.popleft()[0]
+                advanced = True
+            if advanced and not dry_run:
+                save_checkpoint(checkpoint, dict(
+                    state, scanned=state["scanned"] + scanned, updated=state["updated"] + updated,
+                    updated_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                ))
+
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_SECONDS:
+                last_report = now
+                print(f"… {scanned}/{total} rows, {scanned / (now - started):.1f} rows/s, {updated} changed")
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            print(f"\n⏸️ Interrupted; resume with the same command (checkpoint at id {state['last_id']})")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        reader.close()
+        writer.close()
+    pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    summary = {"rows": scanned, "changed": updated, "seconds": round(elapsed, 2),
+               "rows_per_s": round(scanned / elapsed, 1) if elapsed else 0.0, "dry_run": dry_run}
+    print(f"✅ Re-scored {scanned} rows in {elapsed:.1f}s ({summary['rows_per_s']} rows/s), {updated} changed")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score saved ideas with the current models")
+    parser.add_argument("--db", default=DATABASE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per read/score/write unit")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="texts per model forward pass")
+    parser.add_argument("--checkpoint", help="progress file (default: <db>.rescore.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="score but do not write anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Every text is new to the model: don't fill the logit memo. Without it
+    # predict_all_batch still runs one forward pass per batch for both heads
+    os.environ.setdefault("INFER_MEMO_SIZE", "0")
+    # One model version for the whole run (workers inherit the environment)
+    os.environ.setdefault("INFER_RELOAD_SECONDS", "0")
+    try:
+        run(args.db, args.workers, args.chunk_size, args.batch_size, args.checkpoint, args.restart, args.dry_run)
+    except KeyboardInterrupt:
+        raise SystemExit(130)
+
+if __name__ == "__main__":
+    main()
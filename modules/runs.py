@@ -0,0 +1,110 @@
+# modules/runs.py
+"""
+History of Copilot tool runs (table `copilot_runs`, see init_db.py).
+
+Markdown and its rendered HTML are stored as compressed blobs once they
+pass MIN_COMPRESS_BYTES; `codec` records how each row was written so the
+setting can change without rewriting old rows.
+"""
+import os
+import time
+import zlib
+
+CODEC = os.getenv("COPILOT_RUNS_CODEC", "zlib")   # "zlib", "zstd" or "plain"
+MIN_COMPRESS_BYTES = int(os.getenv("COPILOT_RUNS_MIN_COMPRESS_BYTES", 512))
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+LIST_COLUMNS = (
+    "id, tool_key, substr(input, 1, 200) AS input_preview, model, latency_ms, "
+    "prompt_tokens, output_tokens, cached, created_at"
+)
+
+
+# ------------------------
+# Compression
+# ------------------------
+def _zstd():
+    import zstandard
+    return zstandard
+
+def _codec():
+    if CODEC == "zstd":
+        try:
+            _zstd()
+        except ImportError:
+            return "zlib"
+    return CODEC
+
+def compress(text: str, codec: str = None) -> tuple[bytes, str]:
+    """(blob, codec) for `text`; short bodies are stored as plain UTF-8."""
+    raw = (text or "").encode("utf-8")
+    codec = codec or _codec()
+    if len(raw) < MIN_COMPRESS_BYTES or codec == "plain":
+        return raw, "plain"
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=9).compress(raw), "zstd"
+    return zlib.compress(raw, 6), "zlib"
+
+def decompress(blob: bytes, codec: str) -> str:
+    if blob is None:
+        return ""
+    if codec == "zlib":
+        blob = zlib.decompress(blob)
+    elif codec == "zstd":
+        blob = _zstd().ZstdDecompressor().decompress(blob)
+    return bytes(blob).decode("utf-8")
+
+
+# ------------------------
+# Queries
+# ------------------------
+def record(db, user_id, tool_key, user_input, markdown, html, model,
+           latency_ms, usage=None, cached=False) -> int:
+    """Insert one run and commit. Returns the new run id."""
+    usage = usage or {}
+    md_blob, md_codec = compress(markdown)
+    html_blob, html_codec = compress(html)
+    cur = db.execute(
+        """
+        INSERT INTO copilot_runs (user_id, tool_key, input, markdown, markdown_codec, html, html_codec,
+                                  model, latency_ms, prompt_tokens, output_tokens, cached, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (user_id, tool_key, user_input, md_blob, md_codec, html_blob, html_codec, model,
+         int(latency_ms), usage.get("prompt_tokens"), usage.get("output_tokens"), int(cached), time.time()),
+    )
+    db.commit()
+    return cur.lastrowid
+
+def list_page(db, user_id, before_id=None, limit=PAGE_SIZE, tool_key=None):
+    """
+    Newest first, keyset-paginated on id (served by idx_copilot_runs_user).
+    Returns (rows, next_before_id); the latter is None on the last page.
+    Bodies are not read, so listing never decompresses anything.
+    """
+    sql = f"SELECT {LIST_COLUMNS} FROM copilot_runs WHERE user_id = ?"
+    params = [user_id]
+    if tool_key:
+        sql += " AND tool_key = ?"
+        params.append(tool_key)
+    if before_id:
+        sql += " AND id < ?"
+        params.append(before_id)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+    rows = db.execute(sql, params).fetchall()
+    next_before = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_before
+
+def get(db, user_id, run_id):
+    """One run with decompressed markdown/html, or None if not the user's."""
+    row = db.execute(
+        "SELECT * FROM copilot_runs WHERE id = ? AND user_id = ?", (run_id, user_id)
+    ).fetchone()
+    if row is None:
+        return None
+    run = dict(row)
+    run["markdown"] = decompress(row["markdown"], row["markdown_codec"])
+    run["html"] = decompress(row["html"], row["html_codec"])
+    return run
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+from init_db import init_db, migrate_db
+from ml.train_incremental import connect, delta_bounds, iter_saved, sentiment_example
+from modules.enrichment import USER_VERSION
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "test.db")
+    init_db(path)
+    migrate_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password) VALUES ('u', 'u@example.com', 'x')")
+    conn.commit()
+    yield path, conn
+    conn.close()
+
+def add(conn, idea, sentiment, model_version, status="done"):
+    cur = conn.execute(
+        "INSERT INTO saved_ideas (user_id, startup_name, idea, sentiment, label, model_version, enrichment_status) "
+        "VALUES (1, ?, ?, ?, 'Fintech', ?, ?)",
+        (idea, idea, sentiment, model_version, status),
+    )
+    conn.commit()
+    return cur.lastrowid
+
+def texts(path, low=0, high=1 << 62):
+    conn = connect(path)
+    try:
+        return [ex["text"] for ex in iter_saved(conn, low, high, sentiment_example)]
+    finally:
+        conn.close()
+
+def test_trains_only_on_user_labels(db):
+    path, conn = db
+    add(conn, "legacy", "positive", None)
+    add(conn, "keywords", "neutral", "keywords")
+    add(conn, "model", "positive", "sentiment@v1:torch|topics@v1:torch")
+    add(conn, "user", "negative", USER_VERSION)
+    add(conn, "user pending", "negative", USER_VERSION, status="pending")
+    assert texts(path) == ["user"]
+
+def test_relabelling_by_hand_enters_the_delta(db):
+    path, conn = db
+    idea_id = add(conn, "model", "positive", "sentiment@v1:torch|topics@v1:torch")
+    watermark, _ = delta_bounds(connect(path), 0)
+    assert texts(path, watermark) == []
+
+    conn.execute("UPDATE saved_ideas SET sentiment = 'negative', model_version = ? WHERE id = ?",
+                 (USER_VERSION, idea_id))
+    conn.commit()
+    high, changed = delta_bounds(connect(path), watermark)
+    assert (high > watermark, changed) == (True, 1)
+    assert texts(path, watermark, high) == ["model"]